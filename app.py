@@ -1,9 +1,39 @@
 import streamlit as st
-import pandas as pd
 import os
+import logging
 import tempfile
 import json
-from processor import process_file
+import html
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import statement_store
+import exports
+import boilerplate_index
+from section_names import SECTION_TITLES
+
+logger = logging.getLogger(__name__)
+
+# pandas and processor.py (pdfplumber, boto3, ...) take over a second to import, so they are
+# imported where first needed instead of before the first page is drawn
+
+# Files processed at once when several are uploaded, shared by every session
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+
+# Seconds between progress table refreshes while a batch runs
+PROGRESS_REFRESH_SECONDS = 0.5
+
+# Page reruns slower than this (not counting file processing) are logged
+SLOW_RERUN_SECONDS = float(os.getenv("SLOW_RERUN_SECONDS", "0.5"))
+
+# Show rerun times across all sessions in the sidebar
+SHOW_RERUN_STATS = os.getenv("SHOW_RERUN_STATS", "off").lower() not in ("off", "0", "false")
+
+# Recent reruns per kind kept for the percentiles
+RERUN_SAMPLES = 1000
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "straditLogo.png")
 
 # Set the page configuration
 st.set_page_config(
@@ -13,6 +43,14 @@ st.set_page_config(
     initial_sidebar_state="auto"  # Optional: Sidebar state
 )
 
+def display_section_status(data):
+    """Flag sections that timed out or failed instead of finishing"""
+    status = data.get('Status', 'complete')
+    if status == 'timed_out':
+        st.warning("⏱️ This section did not finish within the time budget.")
+    elif status == 'failed':
+        st.warning("⚠️ This section could not be summarized.")
+
 def display_pdf_summaries(summaries):
     """Display PDF summaries in a nice format"""
     st.subheader("📊 Key Takeaways")
@@ -21,6 +59,11 @@ def display_pdf_summaries(summaries):
         st.error(summaries["error"])
         return
 
+    # The boilerplate report covers the whole document, so every section carries the same one
+    report = next((data.get('Boilerplate') for data in summaries.values() if data.get('Boilerplate')), None)
+    if report:
+        st.caption(boilerplate_index.describe_report(report))
+
     # Create tabs for better organization
     section_names = list(summaries.keys())
     if len(section_names) > 1:
@@ -29,6 +72,7 @@ def display_pdf_summaries(summaries):
         for i, section in enumerate(section_names):
             with tabs[i]:
                 data = summaries[section]
+                display_section_status(data)
                 st.write("**Summary:**")
 
                 # st.text(data['Summary'])
@@ -38,40 +82,181 @@ def display_pdf_summaries(summaries):
         # Single section, display directly
         for section, data in summaries.items():
             st.write(f"### {data['Section']}")
+            display_section_status(data)
             st.write("**Summary:**")
 
             # st.text(data['Summary'])
             formatted_summary = data['Summary'].replace('\n', '\n\n')
             st.markdown(f"<div style='text-align: justify; line-height: 1.6; padding: 10px; border-radius: 5px; border-left: 4px solid #dd511d;'>{formatted_summary}</div>", unsafe_allow_html=True)
-def main():
-    logo_path = os.path.join(os.path.dirname(__file__), "straditLogo.png")
-    if os.path.exists(logo_path):
-        import base64
-        from io import BytesIO
-        from PIL import Image as PILImage
-        try:
-            with open(logo_path, "rb") as image_file:
-                img = PILImage.open(image_file)
-                buffered = BytesIO()
-                img.save(buffered, format="PNG")
-                encoded = base64.b64encode(buffered.getvalue()).decode()
-            img_mime = "image/png"
-        except Exception:
-            with open(logo_path, "rb") as image_file:
-                encoded = base64.b64encode(image_file.read()).decode()
-            img_mime = "image/jpeg"
+def summaries_as_text(output):
+    """Plain-text version of a PDF's summaries for download, overall summary first"""
+    summary_text = ""
+    sorted_output = sorted(output.items(), key=lambda x: x[1].get('Priority', 999))
+
+    for section_key, data in sorted_output:
+        if section_key == 'overall_summary':
+            summary_text += "OVERALL SUMMARY\n"
+            summary_text += "=" * 50 + "\n"
+            summary_text += f"{data['Summary']}\n\n"
+
+    for section_key, data in sorted_output:
+        if section_key != 'overall_summary' and "error" not in section_key.lower():
+            summary_text += f"{data['Section'].upper()}\n"
+            summary_text += "=" * len(data['Section']) + "\n"
+            summary_text += f"{data['Summary']}\n\n"
+
+    return summary_text
+
+@st.cache_resource
+def upload_pool():
+    """Worker pool shared by all sessions, so simultaneous batches stay within UPLOAD_WORKERS"""
+    return ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+
+def file_status(output):
+    if isinstance(output, dict) and "error" in output:
+        return "❌ Failed"
+    if isinstance(output, dict) and any(data.get('Status', 'complete') != 'complete' for data in output.values()):
+        return "⚠️ Partial"
+    return "✅ Done"
+
+def progress_rows(uploaded_files, results, started):
+    """One row per uploaded file: its status, section count and processing time"""
+    import pandas as pd
+    rows = []
+    for i, uploaded_file in enumerate(uploaded_files):
+        row = {"File": uploaded_file.name, "Status": "⏳ Queued", "Sections": None, "Seconds": None}
+        if results[i] is not None:
+            output, seconds = results[i]
+            row["Status"] = file_status(output)
+            row["Sections"] = len(output) if isinstance(output, dict) and "error" not in output else None
+            row["Seconds"] = round(seconds, 1)
+        elif i in started:
+            row["Status"] = "🔄 Processing"
+            row["Seconds"] = round(time.perf_counter() - started[i], 1)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def process_batch(uploaded_files):
+    """
+    Process several files on the shared pool, refreshing a progress table
+    as they run. Returns [(output, seconds)] in upload order and the wall time.
+    """
+    from processor import process_file
+    started = {}
+
+    def run(i, uploaded_file):
+        started[i] = time.perf_counter()
+        return process_file(uploaded_file), time.perf_counter() - started[i]
+
+    batch_start = time.perf_counter()
+    futures = {upload_pool().submit(run, i, uploaded_file): i for i, uploaded_file in enumerate(uploaded_files)}
+    results = [None] * len(uploaded_files)
+
+    table = st.empty()
+    progress = st.progress(0.0, text=f"0 of {len(uploaded_files)} files processed")
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=PROGRESS_REFRESH_SECONDS, return_when=FIRST_COMPLETED)
+        for future in done:
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = ({"error": f"Error processing file: {str(e)}"},
+                              time.perf_counter() - started.get(i, batch_start))
+        finished = sum(result is not None for result in results)
+        table.dataframe(progress_rows(uploaded_files, results, started), hide_index=True, width="stretch")
+        progress.progress(finished / len(uploaded_files), text=f"{finished} of {len(uploaded_files)} files processed")
+
+    return results, time.perf_counter() - batch_start
+
+def batch_as_text(uploaded_files, results):
+    """Plain-text version of every file's output in a batch, for the combined download"""
+    combined_text = ""
+    for uploaded_file, (output, _) in zip(uploaded_files, results):
+        combined_text += f"{'#' * 60}\n{uploaded_file.name}\n{'#' * 60}\n\n"
+        if isinstance(output, dict) and "error" in output:
+            combined_text += f"Error: {output['error']}\n\n"
+        elif isinstance(output, dict):
+            combined_text += summaries_as_text(output)
+        else:
+            combined_text += f"{output}\n\n"
+    return combined_text
+
+def display_batch_results(uploaded_files, batch):
+    """Each file's output in an expander, plus one download with all of them"""
+    results = batch['results']
+    total_time = sum(seconds for _, seconds in results)
+    st.success(f"✅ Processed {len(results)} files in {batch['wall_time']:.1f}s ({total_time:.1f}s if run one at a time)")
+
+    for i, (uploaded_file, (output, seconds)) in enumerate(zip(uploaded_files, results)):
+        with st.expander(f"{file_status(output)} {uploaded_file.name} ({seconds:.1f}s)"):
+            if isinstance(output, dict) and "error" in output:
+                st.error(output["error"])
+            elif isinstance(output, dict):
+                display_pdf_summaries(output)
+            else:
+                st.text_area("Text output", output, height=200, key=f"batch_output_{i}")
+
+    st.download_button(
+        label="💾 Download All Summaries as Text",
+        data=batch['text'],
+        file_name="summaries.txt",
+        mime="text/plain"
+    )
+    display_exports([uploaded_file.name for uploaded_file in uploaded_files], "batch")
+
+def display_exports(sources, key):
+    """
+    Download buttons for the stored records and summaries of the given
+    statements (all of them when sources is None). Each file is only built
+    when its button is clicked, so reruns do not pay for it.
+    """
+    if not statement_store.store_enabled():
+        return
+    formats = exports.available_formats()
+    name = "statements" if sources is None else (os.path.splitext(sources[0])[0] if len(sources) == 1 else "batch")
+    for column, fmt in zip(st.columns(len(formats)), formats):
+        label, extension, mime = exports.EXPORT_FORMATS[fmt]
+        with column:
+            st.download_button(
+                label=f"📥 {label}",
+                data=lambda fmt=fmt: exports.export_bytes(fmt, sources),
+                file_name=f"{name}_export.{extension}",
+                mime=mime,
+                on_click="ignore",
+                key=f"export_{key}_{fmt}",
+                help="Extracted table rows, lines and summaries"
+            )
+
+def highlight_snippet(snippet):
+    """Escape a search snippet and highlight its matched terms"""
+    snippet = html.escape(snippet or "")
+    snippet = snippet.replace(statement_store.SNIPPET_START, "<mark>").replace(statement_store.SNIPPET_END, "</mark>")
+    return snippet
+
+def display_search_results(results, elapsed_ms):
+    """List search matches with the statement, section and page they came from"""
+    st.caption(f"{len(results)} matches in {elapsed_ms:.0f} ms")
+    for result in results:
+        section = SECTION_TITLES.get(result['section'], (result['section'] or '').replace('_', ' ').title())
+        where = [result['source'] or 'Unknown statement', section]
+        if result['kind'] == 'summary':
+            where.append("AI summary")
+        elif result['page'] is not None:
+            where.append(f"page {result['page'] + 1}")
+        if result['account']:
+            where.append(f"account {result['account']}")
+        if result['statement_date']:
+            where.append(result['statement_date'])
         st.markdown(
-            f'<div style="display: flex; justify-content: center; align-items: center; margin-bottom: 0.15rem;">'
-            f'<img src="data:{img_mime};base64,{encoded}" width="150" style="border-radius: 14px; background: transparent;" alt="Logo">'
-            '</div>',
+            f'<div style="margin-bottom: 0.6rem;"><span class="file-detail-key">{html.escape(" · ".join(where))}</span>'
+            f'<br>{highlight_snippet(result["snippet"])}</div>',
             unsafe_allow_html=True
         )
-    st.title("📄 Brokerage Statement Summary")
-    #st.write("Upload a PDF brokerage statement to get an AI-powered summary of key sections")
-    st.markdown('<span style="color: #FF7300; font-weight: bold; font-size: 1.1rem;">Upload a PDF brokerage statement to get an AI-powered summary of key sections</span>', unsafe_allow_html=True)
 
-    # Add some styling
-    st.markdown("""
+# Page styles, sent with every rerun
+APP_CSS = """
     <style>
     .stTabs [data-baseweb="tab-list"] button [data-testid="stMarkdownContainer"] p {
         font-size: 16px;
@@ -131,14 +316,103 @@ def main():
             color: #fff !important;
         }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+@st.cache_resource
+def logo_html():
+    """Logo markup with the image inlined as base64, encoded once per process ("" without a logo)"""
+    if not os.path.exists(LOGO_PATH):
+        return ""
+    import base64
+    from io import BytesIO
+    from PIL import Image as PILImage
+    try:
+        with open(LOGO_PATH, "rb") as image_file:
+            img = PILImage.open(image_file)
+            buffered = BytesIO()
+            img.save(buffered, format="PNG")
+            encoded = base64.b64encode(buffered.getvalue()).decode()
+        img_mime = "image/png"
+    except Exception:
+        with open(LOGO_PATH, "rb") as image_file:
+            encoded = base64.b64encode(image_file.read()).decode()
+        img_mime = "image/jpeg"
+    return (
+        f'<div style="display: flex; justify-content: center; align-items: center; margin-bottom: 0.15rem;">'
+        f'<img src="data:{img_mime};base64,{encoded}" width="150" style="border-radius: 14px; background: transparent;" alt="Logo">'
+        '</div>'
+    )
+
+class RerunStats:
+    """Page script run times of every session in this process, by kind ('ui' or 'process')"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.times = {}
+        self.counts = {}
+
+    def record(self, kind, seconds):
+        with self.lock:
+            self.times.setdefault(kind, deque(maxlen=RERUN_SAMPLES)).append(seconds)
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def report(self):
+        """{kind: {'reruns', 'p50_ms', 'p95_ms', 'max_ms'}} over the recent reruns"""
+        with self.lock:
+            samples = {kind: sorted(times) for kind, times in self.times.items()}
+            counts = dict(self.counts)
+        return {
+            kind: {
+                'reruns': counts[kind],
+                'p50_ms': times[len(times) // 2] * 1000,
+                'p95_ms': times[min(len(times) - 1, len(times) * 95 // 100)] * 1000,
+                'max_ms': times[-1] * 1000,
+            }
+            for kind, times in samples.items()
+        }
+
+@st.cache_resource
+def rerun_stats():
+    return RerunStats()
+
+def run_page():
+    """Run the page script, timing it; file processing runs are counted apart from UI reruns"""
+    start = time.perf_counter()
+    kind = "ui"
+    try:
+        kind = main()
+    finally:
+        seconds = time.perf_counter() - start
+        rerun_stats().record(kind, seconds)
+        if kind == "ui" and seconds > SLOW_RERUN_SECONDS:
+            logger.warning("Slow rerun: %.2fs", seconds)
+
+    if SHOW_RERUN_STATS:
+        for kind, stats in sorted(rerun_stats().report().items()):
+            st.sidebar.caption(f"{kind} reruns: {stats['reruns']}, p50 {stats['p50_ms']:.0f} ms, "
+                               f"p95 {stats['p95_ms']:.0f} ms, max {stats['max_ms']:.0f} ms")
+
+def main():
+    """Draw the page; returns "process" when files were processed in this run, else "ui" """
+    kind = "ui"
+    logo = logo_html()
+    if logo:
+        st.markdown(logo, unsafe_allow_html=True)
+    st.title("📄 Brokerage Statement Summary")
+    #st.write("Upload a PDF brokerage statement to get an AI-powered summary of key sections")
+    st.markdown('<span style="color: #FF7300; font-weight: bold; font-size: 1.1rem;">Upload a PDF brokerage statement to get an AI-powered summary of key sections</span>', unsafe_allow_html=True)
 
-    # File uploader with expanded file type support
-    uploaded_file = st.file_uploader(
-        "Choose a file",
+    # Add some styling
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+
+    # File uploader with expanded file type support; several files are processed in parallel
+    uploaded_files = st.file_uploader(
+        "Choose files",
         type=["txt", "pdf"],
-        help="Upload a PDF brokerage statement or text file for processing"
+        accept_multiple_files=True,
+        help="Upload one or more PDF brokerage statements or text files for processing"
     )
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
 
 
     if uploaded_file is not None:
@@ -153,43 +427,21 @@ def main():
         st.markdown('</ul>', unsafe_allow_html=True)
         # Process button
         if st.button("🚀 Process File", type="primary"):
+            kind = "process"
             with st.spinner('🔄 Processing file... This may take a moment for PDF files.'):
                 try:
                     # Call the processing function from processor.py
+                    from processor import process_file
                     output = process_file(uploaded_file)
 
                     # Display the output based on file type
                     if uploaded_file.type == "application/pdf":
                         # PDF processing with summaries
                         if isinstance(output, dict):
-                            # Get overall and section summaries for display
-                            overall_summary = None
-                            section_summaries = []
-
-                            sorted_output = sorted(output.items(), key=lambda x: x[1].get('Priority', 999))
-                            for section_key, data in sorted_output:
-                                if section_key == 'overall_summary':
-                                    overall_summary = data
-                                else:
-                                    section_summaries.append((section_key, data))
-
                             display_pdf_summaries(output)
 
                             # Add download option for summaries
-                            summary_text = ""
-
-                            # Add overall summary first
-                            if overall_summary:
-                                summary_text += "OVERALL SUMMARY\n"
-                                summary_text += "=" * 50 + "\n"
-                                summary_text += f"{overall_summary['Summary']}\n\n"
-
-                            # Add section summaries
-                            for section_key, data in section_summaries:
-                                if "error" not in section_key.lower():
-                                    summary_text += f"{data['Section'].upper()}\n"
-                                    summary_text += "=" * len(data['Section']) + "\n"
-                                    summary_text += f"{data['Summary']}\n\n"
+                            summary_text = summaries_as_text(output)
 
                             if summary_text:
                                 st.download_button(
@@ -198,6 +450,8 @@ def main():
                                     file_name=f"summary_{uploaded_file.name}.txt",
                                     mime="text/plain"
                                 )
+                            if "error" not in output:
+                                display_exports([uploaded_file.name], "single")
                         else:
                             st.error("Unexpected output format from PDF processing")
 
@@ -207,6 +461,7 @@ def main():
                         st.subheader("📄 Processing Output:")
 
                         # Handle different output types
+                        import pandas as pd
                         if isinstance(output, pd.DataFrame):
                             st.dataframe(output)
                         elif isinstance(output, dict):
@@ -227,6 +482,39 @@ def main():
                     st.error(f"❌ Error processing file: {str(e)}")
                     st.write("Please check that your file is a valid PDF or text file and try again.")
 
+    if len(uploaded_files) > 1:
+        st.markdown(f'<div class="file-details-title">{len(uploaded_files)} files selected</div>', unsafe_allow_html=True)
+        # Results are kept for this selection so downloading does not lose them on the rerun
+        batch_key = tuple((uploaded_file.name, uploaded_file.size) for uploaded_file in uploaded_files)
+        if st.button(f"🚀 Process {len(uploaded_files)} Files", type="primary"):
+            kind = "process"
+            results, wall_time = process_batch(uploaded_files)
+            # The combined download is built once here, not on every rerun that shows the results
+            st.session_state['batch'] = {'key': batch_key, 'results': results, 'wall_time': wall_time,
+                                         'text': batch_as_text(uploaded_files, results)}
+
+        batch = st.session_state.get('batch')
+        if batch and batch['key'] == batch_key:
+            display_batch_results(uploaded_files, batch)
+
+    # Search across every statement processed so far
+    if statement_store.store_enabled():
+        search_text = st.text_input(
+            "🔎 Search processed statements",
+            placeholder="Symbol, description, account number...",
+            help="Searches the lines, table rows and summaries of every statement processed so far"
+        )
+        if search_text.strip():
+            start = time.perf_counter()
+            results = statement_store.search(search_text, limit=50)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if results:
+                display_search_results(results, elapsed_ms)
+            else:
+                st.info("No matches found")
+        with st.expander("📥 Export all processed statements", expanded=False):
+            display_exports(None, "all")
+
     # Add some helpful information
     with st.expander("ℹ️ How it works", expanded=False):
         st.write("""
@@ -234,6 +522,7 @@ def main():
         - The app extracts different sections from your brokerage statement (dividends, transactions, positions, fees, etc.)
         - Each section is summarized using AI to highlight key information
         - You can view summaries in organized tabs and download them as text
+        - Extracted table rows and summaries can be exported as CSV, Excel or NDJSON
         
         **For Text Files:**
         - The content is displayed as-is for review
@@ -242,5 +531,7 @@ def main():
         **Supported File Types:** PDF, TXT
         """)
 
+    return kind
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_page()
\ No newline at end of file
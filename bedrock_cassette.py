@@ -0,0 +1,217 @@
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+# "record" wraps the real Bedrock client and appends every invoke_model call to the cassette,
+# "replay" answers from the cassette without AWS credentials or a network, "off" does neither
+CASSETTE_MODE = os.getenv("BEDROCK_CASSETTE", "off").lower()
+
+# JSON Lines file with one recorded call per line
+CASSETTE_PATH = os.getenv("BEDROCK_CASSETTE_PATH", "bedrock_cassette.jsonl")
+
+# Replay latency: "recorded" (each call's own latency), "sampled" (drawn from all latencies
+# recorded for the model), "none", or a number of seconds for every call
+REPLAY_LATENCY = os.getenv("BEDROCK_REPLAY_LATENCY", "recorded").lower()
+
+# Requests that are not in the cassette: "error" raises, "synthetic" returns a placeholder answer
+REPLAY_MISSING = os.getenv("BEDROCK_REPLAY_MISSING", "error").lower()
+
+# Latency of synthetic answers when nothing was recorded for the model (log-normal around the median)
+SYNTHETIC_MEDIAN_SECONDS = float(os.getenv("BEDROCK_SYNTHETIC_MEDIAN", "1.5"))
+SYNTHETIC_SIGMA = float(os.getenv("BEDROCK_SYNTHETIC_SIGMA", "0.35"))
+
+# Seed for sampled and synthetic latencies; the same seed gives the same latencies on every run
+REPLAY_SEED = os.getenv("BEDROCK_REPLAY_SEED", "0")
+
+
+def request_key(model_id, body):
+    """Stable key for an invoke_model request (model plus JSON body, key order ignored)"""
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode("utf-8")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True)
+    except (TypeError, ValueError):
+        pass
+    return hashlib.sha256(f"{model_id}\n{body}".encode("utf-8")).hexdigest()
+
+
+def load_cassette(path):
+    """Recorded calls in file order; a missing file is an empty cassette"""
+    entries = []
+    if not path or not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                print(f"Skipping unreadable cassette line {line_number} in {path}")
+    return entries
+
+
+def error_from_entry(entry):
+    error = entry['error']
+    return ClientError({'Error': {'Code': error.get('code', 'Unknown'), 'Message': error.get('message', '')}},
+                       'InvokeModel')
+
+
+class RecordingClient:
+    """
+    Wraps a bedrock-runtime client and appends each invoke_model call to the
+    cassette: model, request body, response body (or error) and latency.
+    Everything else is passed through to the real client.
+    """
+
+    def __init__(self, client, path=None):
+        self._client = client
+        self.path = path or CASSETTE_PATH
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def write(self, entry):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def invoke_model(self, modelId, body, **kwargs):
+        entry = {'key': request_key(modelId, body), 'model_id': modelId, 'request': json.loads(body),
+                 'recorded_at': time.time()}
+        start = time.perf_counter()
+        try:
+            response = self._client.invoke_model(modelId=modelId, body=body, **kwargs)
+            payload = response['body'].read()
+        except ClientError as e:
+            entry['latency_seconds'] = time.perf_counter() - start
+            entry['error'] = {'code': e.response['Error'].get('Code'), 'message': e.response['Error'].get('Message')}
+            self.write(entry)
+            raise
+
+        entry['latency_seconds'] = time.perf_counter() - start
+        entry['response'] = payload.decode("utf-8")
+        self.write(entry)
+
+        # The streamed body was consumed above, so hand the caller a fresh one
+        response['body'] = io.BytesIO(payload)
+        return response
+
+
+class ReplayClient:
+    """
+    Local stand-in for the bedrock-runtime client that answers invoke_model
+    from a cassette. Repeated requests are served their recordings in order
+    (cycling), and each call sleeps for its replay latency.
+
+    Latencies are derived from the request and how often it has been seen,
+    not from a shared random sequence, so concurrent runs are as repeatable
+    as sequential ones.
+    """
+
+    def __init__(self, path=None, latency=None, missing=None, seed=None):
+        self.path = path or CASSETTE_PATH
+        self.latency = (latency or REPLAY_LATENCY).lower()
+        self.missing = (missing or REPLAY_MISSING).lower()
+        self.seed = REPLAY_SEED if seed is None else str(seed)
+
+        self.recordings = {}
+        self.latencies = {}
+        for entry in load_cassette(self.path):
+            self.recordings.setdefault(entry['key'], []).append(entry)
+            self.latencies.setdefault(entry['model_id'], []).append(entry.get('latency_seconds', 0.0))
+
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._metrics = {'calls': 0, 'replayed': 0, 'synthetic': 0, 'latency_seconds': 0.0}
+
+    def models(self):
+        return sorted(self.latencies)
+
+    def rng(self, key, occurrence):
+        return random.Random(f"{self.seed}:{key}:{occurrence}")
+
+    def replay_latency(self, model_id, key, occurrence, entry=None):
+        if self.latency == 'none':
+            return 0.0
+        if self.latency not in ('recorded', 'sampled'):
+            return float(self.latency)
+
+        if entry is not None and self.latency == 'recorded':
+            return entry.get('latency_seconds', 0.0)
+
+        recorded = self.latencies.get(model_id)
+        if recorded:
+            return self.rng(key, occurrence).choice(recorded)
+        return self.rng(key, occurrence).lognormvariate(math.log(SYNTHETIC_MEDIAN_SECONDS), SYNTHETIC_SIGMA)
+
+    def synthetic_response(self, body):
+        prompt = json.loads(body).get('prompt', '')
+        user_text = prompt.split("<|start_header_id|>user<|end_header_id|>\n", 1)[-1]
+        first_line = user_text.strip().split('\n')[0][:80]
+        return json.dumps({'generation': f"Synthetic replay summary for: {first_line}.",
+                           'stop_reason': 'stop'})
+
+    def invoke_model(self, modelId, body, **kwargs):
+        key = request_key(modelId, body)
+        with self._lock:
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+
+        recordings = self.recordings.get(key)
+        if recordings:
+            entry = recordings[occurrence % len(recordings)]
+        elif self.missing == 'synthetic':
+            entry = None
+        else:
+            raise ClientError({'Error': {'Code': 'CassetteMiss',
+                                         'Message': f"No recording for this {modelId} request in {self.path}"}},
+                              'InvokeModel')
+
+        delay = self.replay_latency(modelId, key, occurrence, entry)
+        time.sleep(delay)
+
+        with self._lock:
+            self._metrics['calls'] += 1
+            self._metrics['replayed' if entry else 'synthetic'] += 1
+            self._metrics['latency_seconds'] += delay
+
+        if entry is not None and entry.get('error'):
+            raise error_from_entry(entry)
+
+        payload = entry['response'] if entry is not None else self.synthetic_response(body)
+        return {'body': io.BytesIO(payload.encode("utf-8")), 'contentType': 'application/json'}
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+
+def wrap_client(create_client):
+    """
+    Client for the current cassette mode: the real one (off), the real one
+    wrapped for recording (record), or a ReplayClient (replay, create_client
+    is never called).
+    """
+    if CASSETTE_MODE == 'replay':
+        return ReplayClient()
+    if CASSETTE_MODE == 'record':
+        return RecordingClient(create_client())
+    return create_client()
+
+
+def recorded_model():
+    """In replay mode, the first model in the cassette (used when BEDROCK_MODEL_ID is not set)"""
+    if CASSETTE_MODE != 'replay':
+        return None
+    for entry in load_cassette(CASSETTE_PATH):
+        return entry['model_id']
+    return None
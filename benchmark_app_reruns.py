@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import statement_store
+from section_names import SECTION_NAMES
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Reruns timed after the first page load, alternating plain reruns and search box edits
+RERUNS = 40
+
+SEARCH_TEXT = "AAPL"
+
+# Statements stored before the run, so searches return matches
+STATEMENTS = 50
+LINES_PER_SECTION = 40
+SYMBOLS = ["AAPL", "MSFT", "VTI", "DBLTX", "SPAXX"]
+
+# Heavy modules the first page load should not need
+DEFERRED_MODULES = ["processor", "pandas", "pdfplumber", "boto3", "openpyxl"]
+
+
+def populate_store():
+    """
+    Fill the store with synthetic statements. Only statement_store is used
+    (the app imports it anyway), so the pipeline stays out of this process.
+    """
+    for i in range(STATEMENTS):
+        month = i % 12 + 1
+        sections = {'overall_text': f"Statement period {month}/01/2024 - {month}/28/2024"}
+        for section in SECTION_NAMES:
+            sections[section] = [f"{month}/{day % 28 + 1:02d} {SYMBOLS[day % len(SYMBOLS)]} {section} item ${day * 12.5:,.2f}"
+                                 for day in range(LINES_PER_SECTION)]
+        statement_id = statement_store.save_statement(sections, source=f"statement_{i:03d}.pdf",
+                                                      section_names=SECTION_NAMES)
+        statement_store.save_summaries(statement_id, {
+            section: {'summary': f"{SYMBOLS[i % len(SYMBOLS)]} {section} activity for month {month}."}
+            for section in SECTION_NAMES
+        })
+
+
+def main():
+    """
+    Runs app.py in-process with AppTest: the first page load of a fresh
+    process (imports and asset encoding), then reruns like widget
+    interactions, including searches of a store filled with synthetic
+    statements. Nothing is processed, so no LLM is called.
+
+    Script times come from the app's own rerun statistics (SHOW_RERUN_STATS),
+    which cover every session of a deployed app; AppTest's wall time per
+    rerun is mostly its own polling.
+    """
+    os.environ["STATEMENT_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="benchmark_reruns_"), "statements.db")
+    os.environ["SHOW_RERUN_STATS"] = "on"
+    statement_store.DB_PATH = os.environ["STATEMENT_DB_PATH"]
+    populate_store()
+
+    start = time.perf_counter()
+    at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+    first = time.perf_counter() - start
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    print(f"first page load (cold process): {first * 1000:.0f} ms; heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+    for i in range(RERUNS):
+        if i % 2:
+            at.text_input[0].input(SEARCH_TEXT if i % 4 == 1 else "").run()
+        else:
+            at.run()
+    if at.exception:
+        print(f"error: {at.exception[0].message}")
+        return 1
+
+    at.text_input[0].input(SEARCH_TEXT).run()
+    print(f"search results: {at.caption[0].value if at.caption else 'none'}")
+    loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+    print(f"heavy modules loaded after {RERUNS} reruns and searches: {', '.join(loaded) or 'none'}")
+
+    for caption in at.sidebar.caption:
+        print(f"page script {caption.value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
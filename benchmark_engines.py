@@ -0,0 +1,88 @@
+import sys
+import time
+from collections import Counter
+
+from extraction_engines import iter_pages, pymupdf_available
+from processor import extract_tables_and_sections
+from section_names import SECTION_NAMES
+
+SAMPLE_PDFS = ["sample-new-fidelity-acnt-stmt.pdf", "sample_statement.pdf", "document.pdf"]
+
+
+def text_overlap(text_a, text_b):
+    """
+    Share of non-whitespace characters the two texts have in common.
+
+    The engines split words and order columns differently, so the comparison
+    ignores whitespace and character order.
+    """
+    chars_a = Counter(''.join(text_a.split()))
+    chars_b = Counter(''.join(text_b.split()))
+    total = max(sum(chars_a.values()), sum(chars_b.values()))
+    if total == 0:
+        return 1.0
+    return sum((chars_a & chars_b).values()) / total
+
+
+def compare_outputs(pdf_path):
+    """
+    Check that both engines produce equivalent sections for one PDF. Templates
+    are turned off, since template statements are read the same way by both.
+    """
+    reference = extract_tables_and_sections(pdf_path, engine="pdfplumber", use_templates=False,
+                                            remove_boilerplate=False)
+    fast = extract_tables_and_sections(pdf_path, engine="pymupdf", use_templates=False, remove_boilerplate=False)
+
+    if 'error' in reference or 'error' in fast:
+        print(f"  extraction error: {reference.get('error') or fast.get('error')}")
+        return False
+
+    overlap = text_overlap(reference['overall_text'], fast['overall_text'])
+    print(f"  overall text character overlap: {overlap:.1%}")
+
+    tables_match = True
+    for section in SECTION_NAMES:
+        ref_tables = [item for item in reference[section] if isinstance(item, list)]
+        fast_tables = [item for item in fast[section] if isinstance(item, list)]
+        if ref_tables != fast_tables:
+            tables_match = False
+            print(f"  {section}: {len(ref_tables)} tables (pdfplumber) vs {len(fast_tables)} tables (pymupdf)")
+
+    print(f"  tables identical: {tables_match}")
+    return tables_match and overlap >= 0.99
+
+
+def measure_throughput(pdf_path, engine, runs=3):
+    """Return pages per second for one engine, best of several runs"""
+    best = None
+    pages = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        pages = sum(1 for _ in iter_pages(pdf_path, engine))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return pages, pages / best if best else 0.0
+
+
+def main():
+    if not pymupdf_available():
+        print("PyMuPDF is not installed - nothing to compare")
+        return 1
+
+    pdf_files = sys.argv[1:] or SAMPLE_PDFS
+    all_match = True
+
+    for pdf_path in pdf_files:
+        print(f"\n===== {pdf_path} =====")
+        all_match = compare_outputs(pdf_path) and all_match
+
+        for engine in ['pdfplumber', 'pymupdf']:
+            pages, pages_per_sec = measure_throughput(pdf_path, engine)
+            print(f"  {engine:<10} {pages} pages, {pages_per_sec:.1f} pages/sec")
+
+    print("\nParity OK" if all_match else "\nParity check FAILED")
+    return 0 if all_match else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
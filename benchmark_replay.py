@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+import bedrock_cassette
+import boilerplate_index
+import llm_backends
+import statement_store
+import summary_history
+from processor import process_brokerage_statement
+
+SAMPLE_PDFS = ["sample-new-fidelity-acnt-stmt.pdf", "sample_statement.pdf", "document.pdf"]
+
+# Repeated runs of each PDF; replayed runs should match each other
+RUNS = 2
+
+# Model id for synthetic answers when the cassette is empty and BEDROCK_MODEL_ID is not set
+PLACEHOLDER_MODEL = "meta.llama3-8b-instruct-v1:0"
+
+
+def run(pdf_path):
+    """Summarize one statement against the replayed Bedrock client; returns (seconds, summaries)"""
+    llm = llm_backends.BedrockBackend(cache_size=0)
+    start = time.perf_counter()
+    summaries = process_brokerage_statement(pdf_path, llm, use_store=False)
+    return time.perf_counter() - start, summaries, llm.client.metrics()
+
+
+def main():
+    """
+    End-to-end timing with Bedrock replayed from a cassette, no AWS account or network needed.
+
+    Record a cassette first with BEDROCK_CASSETTE=record (app.py or main.py with
+    LLM_PROVIDER=bedrock). Without one, requests get synthetic answers and latencies.
+    """
+    bedrock_cassette.CASSETTE_MODE = 'replay'
+    if not bedrock_cassette.load_cassette(bedrock_cassette.CASSETTE_PATH):
+        print(f"No recordings in {bedrock_cassette.CASSETTE_PATH}; using synthetic answers and latencies")
+        bedrock_cassette.REPLAY_MISSING = 'synthetic'
+        os.environ.setdefault("BEDROCK_MODEL_ID", PLACEHOLDER_MODEL)
+
+    # Nothing read from or written to the local stores, so every run makes the same calls
+    summary_history.HISTORY_DIR = ""
+    statement_store.DB_PATH = ""
+    boilerplate_index.INDEX_PATH = ""
+
+    pdf_files = sys.argv[1:] or SAMPLE_PDFS
+    for pdf_path in pdf_files:
+        print(f"\n===== {pdf_path} =====")
+
+        results = [run(pdf_path) for _ in range(RUNS)]
+        if any('error' in summaries for _, summaries, _ in results):
+            print(f"  error: {results[0][1].get('error')}")
+            continue
+
+        for seconds, summaries, metrics in results:
+            print(f"  {seconds:.2f}s wall, {metrics['calls']} calls "
+                  f"({metrics['replayed']} replayed, {metrics['synthetic']} synthetic), "
+                  f"{metrics['latency_seconds']:.2f}s replayed latency")
+
+        first = results[0][1]
+        identical = all(summaries == first for _, summaries, _ in results[1:])
+        print(f"  summaries identical across runs: {identical}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+import boilerplate_index
+import llm_backends
+import model_routing
+import statement_store
+import summary_history
+from processor import process_brokerage_statement
+
+SAMPLE_PDFS = ["sample-new-fidelity-acnt-stmt.pdf", "sample_statement.pdf", "document.pdf"]
+
+# Seconds per call for the standard fake model at 500 tokens (the small one is faster)
+FAKE_LATENCY = "0.5"
+
+
+def run(pdf_path, routing):
+    """Summarize one statement with the fake provider; returns (seconds, summaries)"""
+    model_routing.ROUTING_ENABLED = routing
+    start = time.perf_counter()
+    summaries = process_brokerage_statement(pdf_path, llm_backends.get_backend('fake'), use_store=False)
+    return time.perf_counter() - start, summaries
+
+
+def main():
+    # Offline: stub models only, and nothing read from or written to the local stores
+    os.environ.setdefault("FAKE_LLM_LATENCY", FAKE_LATENCY)
+    llm_backends.CACHE_SIZE = 0
+    summary_history.HISTORY_DIR = ""
+    statement_store.DB_PATH = ""
+    boilerplate_index.INDEX_PATH = ""
+
+    pdf_files = sys.argv[1:] or SAMPLE_PDFS
+    for pdf_path in pdf_files:
+        print(f"\n===== {pdf_path} =====")
+
+        baseline, _ = run(pdf_path, routing=False)
+        model_routing.reset_routing_stats()
+        routed, summaries = run(pdf_path, routing=True)
+
+        if 'error' in summaries:
+            print(f"  error: {summaries['error']}")
+            continue
+
+        for section, data in summaries.items():
+            print(f"  {section:<16} -> {data.get('route', '-'):<9} {data['status']}")
+
+        for route, stats in sorted(model_routing.routing_report().items()):
+            print(f"  route {route:<9} {stats['calls']} calls, models {', '.join(stats['models'])}, "
+                  f"avg {stats['avg_latency_seconds']:.2f}s, max {stats['max_latency_seconds']:.2f}s")
+
+        print(f"  wall time: {baseline:.2f}s without routing, {routed:.2f}s with routing")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+from json_files import write_json_atomic
+
+# Line-frequency index shared by all processed statements; set to "" to disable it
+INDEX_PATH = os.getenv(
+    "BOILERPLATE_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "boilerplate_index.json")
+)
+
+# A line on at least this share of a document's pages is a running header/footer
+PAGE_REPEAT_RATIO = float(os.getenv("BOILERPLATE_PAGE_RATIO", "0.5"))
+PAGE_REPEAT_MIN_PAGES = int(os.getenv("BOILERPLATE_PAGE_MIN_PAGES", "3"))
+
+# A line in at least this share of indexed statements is corpus boilerplate,
+# once the index has seen enough statements for the share to mean anything
+CORPUS_RATIO = float(os.getenv("BOILERPLATE_CORPUS_RATIO", "0.3"))
+CORPUS_MIN_DOCUMENTS = int(os.getenv("BOILERPLATE_MIN_DOCUMENTS", "5"))
+
+# Shorter lines (column labels, "Total") are too generic to judge
+MIN_LINE_CHARS = int(os.getenv("BOILERPLATE_MIN_LINE_CHARS", "12"))
+
+# Bounds on the persisted index
+MAX_INDEX_LINES = 200000
+MAX_INDEX_DOCUMENTS = 50000
+
+# Rough prompt-token estimate used in reports
+CHARS_PER_TOKEN = 4
+
+DIGIT_RE = re.compile(r'\d')
+
+# Statements processed in parallel share the index file; its load/update/save is serialized
+INDEX_LOCK = threading.Lock()
+
+
+def line_key(line):
+    """Normalize a line so the same text with different numbers/dates matches"""
+    return ' '.join(DIGIT_RE.sub('#', line.lower()).split())
+
+
+def line_digest(key):
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def load_index(path=None):
+    path = INDEX_PATH if path is None else path
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'documents': [], 'lines': {}}
+    except Exception as e:
+        print(f"Error loading boilerplate index: {e}")
+        return {'documents': [], 'lines': {}}
+
+
+def save_index(index, path=None):
+    """Write the index atomically so concurrent readers never see a partial file"""
+    path = INDEX_PATH if path is None else path
+    try:
+        write_json_atomic(path, index)
+    except Exception as e:
+        print(f"Error saving boilerplate index: {e}")
+
+
+def update_index(index, digests):
+    """
+    Count a document's distinct lines into the index. A document that was
+    already indexed (same set of lines) is not counted twice.
+    """
+    document = hashlib.sha1('\n'.join(sorted(digests)).encode("utf-8")).hexdigest()
+    if document in index['documents']:
+        return False
+
+    index['documents'].append(document)
+    if len(index['documents']) > MAX_INDEX_DOCUMENTS:
+        index['documents'] = index['documents'][-MAX_INDEX_DOCUMENTS:]
+
+    lines = index['lines']
+    for digest in digests:
+        lines[digest] = lines.get(digest, 0) + 1
+
+    # Lines seen only once are the first thing to go when the index grows too large
+    if len(lines) > MAX_INDEX_LINES:
+        index['lines'] = {digest: count for digest, count in lines.items() if count > 1}
+
+    return True
+
+
+def strip_boilerplate(pages, get_text=None, index_path=None,
+                      page_ratio=None, corpus_ratio=None, min_documents=None):
+    """
+    Remove running headers/footers and cross-statement boilerplate.
+
+    pages is a list of pages, each a list of items; get_text returns an
+    item's line text (items are the lines themselves by default).
+
+    - Lines repeated on at least page_ratio of the pages keep their first
+      occurrence (it often carries the account and period) and lose the rest.
+    - Digit-free lines found in at least corpus_ratio of indexed statements
+      are removed everywhere. Lines with numbers may carry statement data,
+      so they are only ever treated as page repeats.
+
+    Returns (filtered pages, report).
+    """
+    get_text = get_text or (lambda item: item)
+    index_path = INDEX_PATH if index_path is None else index_path
+    page_ratio = PAGE_REPEAT_RATIO if page_ratio is None else page_ratio
+    corpus_ratio = CORPUS_RATIO if corpus_ratio is None else corpus_ratio
+    min_documents = CORPUS_MIN_DOCUMENTS if min_documents is None else min_documents
+
+    # Digest every line that is long enough to judge
+    page_digests = []
+    for page in pages:
+        digests = []
+        for item in page:
+            key = line_key(get_text(item))
+            digests.append(line_digest(key) if len(key) >= MIN_LINE_CHARS else None)
+        page_digests.append(digests)
+
+    page_counts = Counter()
+    for digests in page_digests:
+        page_counts.update({digest for digest in digests if digest})
+
+    repeated = set()
+    if len(pages) >= PAGE_REPEAT_MIN_PAGES:
+        min_pages = max(2, page_ratio * len(pages))
+        repeated = {digest for digest, count in page_counts.items() if count >= min_pages}
+
+    # Update the corpus index with this document and look up corpus frequencies
+    corpus = set()
+    if index_path:
+        with INDEX_LOCK:
+            index = load_index(index_path)
+            if update_index(index, page_counts.keys()):
+                save_index(index, index_path)
+
+        documents = len(index['documents'])
+        if documents >= min_documents:
+            lines = index['lines']
+            # The current document is already counted, so a line needs another statement too
+            min_count = max(2, corpus_ratio * documents)
+            corpus = {digest for digest in page_counts if lines.get(digest, 0) >= min_count}
+
+    report = {'page_repeated_lines': 0, 'corpus_lines': 0, 'chars_removed': 0}
+    seen = set()
+    filtered = []
+
+    for page, digests in zip(pages, page_digests):
+        kept = []
+        for item, digest in zip(page, digests):
+            text = get_text(item)
+
+            if digest in corpus and not DIGIT_RE.search(text):
+                report['corpus_lines'] += 1
+                report['chars_removed'] += len(text)
+                continue
+
+            if digest in repeated:
+                if digest in seen:
+                    report['page_repeated_lines'] += 1
+                    report['chars_removed'] += len(text)
+                    continue
+                seen.add(digest)
+
+            kept.append(item)
+        filtered.append(kept)
+
+    report['lines_removed'] = report['page_repeated_lines'] + report['corpus_lines']
+    report['tokens_saved'] = report['chars_removed'] // CHARS_PER_TOKEN
+
+    return filtered, report
+
+
+def describe_report(report):
+    """One-line description of a strip_boilerplate report, for the app and the CLI"""
+    return (f"Removed {report['lines_removed']} boilerplate lines "
+            f"({report['page_repeated_lines']} page repeats, {report['corpus_lines']} corpus), "
+            f"~{report['tokens_saved']} prompt tokens saved")
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import stage_timing
+
+# Default time budget (seconds) for processing one uploaded statement; "0" or "" disables it
+DEFAULT_TIME_BUDGET = float(os.getenv("PROCESS_TIME_BUDGET", "120") or 0)
+
+# Section statuses reported to callers
+COMPLETE = 'complete'
+TIMED_OUT = 'timed_out'
+FAILED = 'failed'
+
+
+class TimeBudgetExceeded(Exception):
+    """Raised when a stage notices the request's time budget has run out"""
+
+
+def make_deadline(time_budget):
+    """Turn a budget in seconds into a monotonic deadline (None for no limit)"""
+    if not time_budget or time_budget <= 0:
+        return None
+    return time.monotonic() + time_budget
+
+
+def remaining(deadline):
+    """Seconds left before the deadline (None for no limit)"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def check_deadline(deadline, stage):
+    if expired(deadline):
+        raise TimeBudgetExceeded(f"Time budget exhausted during {stage}")
+
+
+def run_jobs(jobs, deadline, max_workers):
+    """
+    Run {key: (fn, args)} on a thread pool until the deadline.
+
+    Returns ({key: result} for finished jobs, [keys that did not finish]).
+    Jobs not yet started are cancelled; running ones are abandoned so the
+    caller returns on time (their own timeouts end them later).
+    """
+    if not jobs:
+        return {}, []
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)))
+    futures = {key: executor.submit(stage_timing.worker(fn), *args) for key, (fn, args) in jobs.items()}
+    try:
+        wait(futures.values(), timeout=remaining(deadline))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    finished, unfinished = {}, []
+    for key, future in futures.items():
+        if future.done() and not future.cancelled():
+            finished[key] = future.result()
+        else:
+            unfinished.append(key)
+    return finished, unfinished
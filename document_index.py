@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+from extraction_engines import pymupdf_available
+from json_files import write_json_atomic
+from statement_templates import STATEMENT_TEMPLATES, heading_section, match_template
+
+# PyMuPDF is optional - without it there is no index and every page is read
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# Directory caching one index per PDF (keyed by content hash); set to "" to rebuild every time
+INDEX_DIR = os.getenv("DOCUMENT_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "document_index"))
+
+# Bump when the index format or heading rules change, so cached indexes are rebuilt
+INDEX_VERSION = 1
+
+# Lines at least this much larger than the body text (the most common font size) are headings
+HEADER_SIZE_RATIO = 1.2
+MAX_HEADER_CHARS = 80
+
+# Heading text on at least this share of pages is a running header, not a section start
+RUNNING_HEADER_RATIO = 0.3
+
+# Heading keywords per section for statements without a template, first match wins
+SECTION_KEYWORDS = [
+    ('fees', ('fee', 'charge', 'commission', 'expense')),
+    ('positions', ('holding', 'position', 'investment detail', 'asset')),
+    ('dividends', ('dividend', 'distribution', 'income', 'interest')),
+    ('transactions', ('transaction', 'activity', 'trade', 'bought', 'sold', 'purchase')),
+    ('performance', ('gain', 'loss', 'performance', 'return', 'change in')),
+    ('account_summary', ('summary', 'account value', 'portfolio value', 'balance', 'overview')),
+]
+
+LETTER_RE = re.compile(r'[A-Za-z]{3,}')
+
+
+def index_enabled():
+    return pymupdf_available()
+
+
+def file_digest(pdf_path):
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def keyword_section(title):
+    title = title.lower()
+    for section, keywords in SECTION_KEYWORDS:
+        if any(keyword in title for keyword in keywords):
+            return section
+    return None
+
+
+def title_section(title, template):
+    """Section a heading or outline title starts, or None when it does not name one"""
+    if template:
+        return heading_section(title.strip(), template, None)
+    return keyword_section(title)
+
+
+def page_lines(page):
+    """(top, size, text) for every text line of a page"""
+    lines = []
+    for block in page.get_text("dict", flags=0)["blocks"]:
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if text:
+                lines.append((line["bbox"][1], max(span["size"] for span in line["spans"]), text))
+    return lines
+
+
+def layout_headings(doc, template):
+    """(page_num, top, title) for large-font lines that look like section headings"""
+    pages = [page_lines(doc.load_page(page_num)) for page_num in range(len(doc))]
+
+    if template:
+        min_size = template['heading_min_size']
+    else:
+        sizes = Counter()
+        for lines in pages:
+            for _, size, text in lines:
+                sizes[round(size, 1)] += len(text)
+        min_size = sizes.most_common(1)[0][0] * HEADER_SIZE_RATIO if sizes else 0
+
+    candidates = [
+        (page_num, top, text)
+        for page_num, lines in enumerate(pages)
+        for top, size, text in lines
+        if size >= min_size and len(text) <= MAX_HEADER_CHARS and LETTER_RE.search(text)
+    ]
+
+    # Drop running headers (account numbers, statement titles) repeated across pages
+    page_counts = Counter()
+    for text in {(page_num, text) for page_num, _, text in candidates}:
+        page_counts[text[1]] += 1
+    max_pages = max(2, RUNNING_HEADER_RATIO * len(doc))
+    return [heading for heading in candidates if page_counts[heading[2]] < max_pages]
+
+
+def page_ranges(page_nums):
+    """[[first, last], ...] 1-based ranges covering the 0-based page numbers"""
+    ranges = []
+    for page_num in sorted(page_nums):
+        if ranges and ranges[-1][1] == page_num:
+            ranges[-1][1] = page_num + 1
+        else:
+            ranges.append([page_num + 1, page_num + 1])
+    return ranges
+
+
+def build_index(pdf_path):
+    """
+    Map each section to the pages it spans, from the PDF outline (bookmarks)
+    and its heading lines. A section runs from its heading to the next one,
+    so a page also belongs to the section carried over from the page before.
+    """
+    template_name = match_template(pdf_path)
+    template = STATEMENT_TEMPLATES.get(template_name)
+
+    doc = fitz.open(pdf_path)
+    try:
+        # Outline entries count as headings at the top of their page
+        outline = [(page - 1, -1.0, title) for _, title, page in doc.get_toc() if 0 < page <= len(doc)]
+        headings = sorted(outline + layout_headings(doc, template))
+        page_count = len(doc)
+    finally:
+        doc.close()
+
+    page_sections = [set() for _ in range(page_count)]
+    entries = []
+    current = None
+    position = 0
+    for page_num in range(page_count):
+        if current:
+            page_sections[page_num].add(current)
+        while position < len(headings) and headings[position][0] == page_num:
+            _, _, title = headings[position]
+            position += 1
+            section = title_section(title, template)
+            if section:
+                current = section
+                page_sections[page_num].add(section)
+                entries.append([page_num + 1, title, section])
+
+    sections = {}
+    for page_num, names in enumerate(page_sections):
+        for name in names:
+            sections.setdefault(name, []).append(page_num)
+
+    return {
+        'version': INDEX_VERSION,
+        'pages': page_count,
+        'template': template_name,
+        'outline_entries': len(outline),
+        'headings': entries,
+        'sections': {name: page_ranges(page_nums) for name, page_nums in sections.items()},
+    }
+
+
+def index_path(digest):
+    return os.path.join(INDEX_DIR, f"{digest}.json")
+
+
+def save_index(index, path):
+    """Write the index atomically so concurrent readers never see a partial file"""
+    try:
+        write_json_atomic(path, index)
+    except Exception as e:
+        print(f"Error saving document index: {e}")
+
+
+def load_index(pdf_path):
+    """
+    Return the section index for a PDF, building it on first use and caching
+    it under INDEX_DIR. Returns None when PyMuPDF is not installed.
+    """
+    if not index_enabled():
+        return None
+
+    path = index_path(file_digest(pdf_path)) if INDEX_DIR else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                return index
+        except Exception as e:
+            print(f"Error loading document index: {e}")
+
+    index = build_index(pdf_path)
+    if path:
+        save_index(index, path)
+    return index
+
+
+def section_pages(index, section_names):
+    """
+    0-based pages to read for the given sections, or None when the index
+    does not locate all of them (the caller should then read every page).
+    """
+    if not index or any(name not in index['sections'] for name in section_names):
+        return None
+
+    pages = set()
+    for name in section_names:
+        for first, last in index['sections'][name]:
+            pages.update(range(first - 1, last))
+    return sorted(pages)
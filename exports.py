@@ -0,0 +1,201 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+
+import statement_store
+
+# openpyxl is optional - without it only the CSV and NDJSON exports are offered. It is
+# slow to import, so it is only loaded when an Excel file is written
+XLSX_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+
+# Rows fetched from the store at a time; an export holds about this many rows in memory
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+# Rows per Excel sheet (the format's limit, less the header); longer exports continue on another sheet
+MAX_SHEET_ROWS = 1048575
+
+EXPORT_FIELDS = ['source', 'statement_date', 'account', 'section', 'page', 'kind', 'symbol',
+                 'trade_date', 'description', 'amount', 'amounts', 'text']
+
+# Fields repeated on the 'header' row written before each table in CSV and Excel exports
+HEADER_ROW_FIELDS = ['source', 'statement_date', 'account', 'section', 'page']
+
+# format: (label, file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ("CSV", "csv", "text/csv"),
+    'xlsx': ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'ndjson': ("NDJSON", "ndjson", "application/x-ndjson"),
+}
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'xlsx' or XLSX_AVAILABLE]
+
+
+def statement_ids(sources=None, path=None):
+    """Ids of the latest stored statement for each source name, or of every statement when sources is None"""
+    if sources is None:
+        return [row['id'] for row in statement_store.query("SELECT id FROM statements ORDER BY id", path=path)]
+    ids = []
+    for source in sources:
+        rows = statement_store.query("SELECT id FROM statements WHERE source = ? ORDER BY processed_at DESC LIMIT 1",
+                                     (source,), path)
+        ids.extend(row['id'] for row in rows)
+    return ids
+
+
+def export_rows(ids, path=None):
+    """
+    Yield the stored lines and table rows of the statements, then their
+    summaries (kind 'summary'), as EXPORT_FIELDS dicts. Pages are 1-based.
+    Table rows also carry 'cells' and the table's 'header' as lists (None
+    for lines, summaries and rows stored before cells were kept).
+    """
+    for statement_id in ids:
+        rows = statement_store.iter_query(
+            "SELECT s.source, r.statement_date, r.account, r.section, r.page, r.kind, r.symbol, r.trade_date, "
+            "r.description, r.amount, r.amounts, r.text, r.cells, r.header "
+            "FROM records r JOIN statements s ON s.id = r.statement_id "
+            "WHERE r.statement_id = ? ORDER BY r.id", (statement_id,), EXPORT_BATCH_ROWS, path)
+        for row in rows:
+            if row['page'] is not None:
+                row['page'] += 1
+            row['cells'] = json.loads(row['cells']) if row['cells'] else None
+            row['header'] = json.loads(row['header']) if row['header'] else None
+            yield row
+
+    for statement_id in ids:
+        rows = statement_store.iter_query(
+            "SELECT s.source, s.period_end AS statement_date, m.section, 'summary' AS kind, m.summary AS text "
+            "FROM summaries m JOIN statements s ON s.id = m.statement_id WHERE m.statement_id = ? ORDER BY m.id",
+            (statement_id,), EXPORT_BATCH_ROWS, path)
+        for row in rows:
+            record = {field: row.get(field) for field in EXPORT_FIELDS}
+            record['cells'] = record['header'] = None
+            yield record
+
+
+def cell_column_count(ids, path=None):
+    """Most cells in any stored table row (or header) of the statements"""
+    count = 0
+    for statement_id in ids:
+        row = statement_store.query(
+            "SELECT MAX(json_array_length(cells)) AS cells, MAX(json_array_length(header)) AS header "
+            "FROM records WHERE statement_id = ?", (statement_id,), path)[0]
+        count = max(count, row['cells'] or 0, row['header'] or 0)
+    return count
+
+
+def cell_columns(count):
+    return [f"column_{i}" for i in range(1, count + 1)]
+
+
+def table_rows(rows, count):
+    """
+    Flatten export rows for CSV and Excel: EXPORT_FIELDS followed by count
+    cell columns. Each table starts with a 'header' row holding its header
+    cells in the cell columns.
+    """
+    header = None
+    for row in rows:
+        if row['header'] and row['header'] != header:
+            header_row = {field: row[field] if field in HEADER_ROW_FIELDS else None for field in EXPORT_FIELDS}
+            header_row['kind'] = 'header'
+            yield [header_row[field] for field in EXPORT_FIELDS] + pad(row['header'], count)
+        header = row['header']
+        yield [row[field] for field in EXPORT_FIELDS] + pad(row['cells'] or [], count)
+
+
+def pad(cells, count):
+    return list(cells[:count]) + [None] * (count - len(cells))
+
+
+def write_csv(rows, out_path, count):
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_FIELDS + cell_columns(count))
+        writer.writerows(table_rows(rows, count))
+
+
+def write_ndjson(rows, out_path, count):
+    """One object per row; table rows keep their cells and header as lists"""
+    with open(out_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def write_xlsx(rows, out_path, count):
+    """Records and Summaries sheets, streamed with openpyxl's write-only mode"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    fields = EXPORT_FIELDS + cell_columns(count)
+    kind_column = EXPORT_FIELDS.index('kind')
+    sheets = {}
+
+    def sheet_for(name):
+        sheet = sheets.get(name)
+        if sheet is None or sheet['rows'] >= MAX_SHEET_ROWS:
+            count = sheets[name]['count'] + 1 if sheet else 1
+            title = name if count == 1 else f"{name} ({count})"
+            sheet = sheets[name] = {'sheet': workbook.create_sheet(title), 'rows': 0, 'count': count}
+            sheet['sheet'].append(fields)
+        return sheet
+
+    sheet_for('Records')
+    for row in table_rows(rows, count):
+        sheet = sheet_for('Summaries' if row[kind_column] == 'summary' else 'Records')
+        sheet['sheet'].append(row)
+        sheet['rows'] += 1
+    workbook.save(out_path)
+
+
+WRITERS = {'csv': write_csv, 'xlsx': write_xlsx, 'ndjson': write_ndjson}
+
+
+def write_export(fmt, out_path, sources=None, path=None):
+    """Write the statements' records and summaries to out_path in the given format"""
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported export format: {fmt}")
+    ids = statement_ids(sources, path)
+    WRITERS[fmt](export_rows(ids, path), out_path, cell_column_count(ids, path))
+
+
+def export_bytes(fmt, sources=None, path=None):
+    """
+    The export as bytes for a download. It is written to a temporary file
+    first, so only the finished file is held in memory.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=f".{EXPORT_FORMATS[fmt][1]}")
+    os.close(fd)
+    try:
+        write_export(fmt, tmp_path, sources, path)
+        with open(tmp_path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(tmp_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export stored statement records and summaries")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS),
+                        help="export format (default: from the output file's extension)")
+    parser.add_argument("--source", action="append",
+                        help="statement file name to export (repeatable; default: every statement)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in available_formats():
+        print(f"Error: unsupported export format '{fmt}' (available: {', '.join(available_formats())})")
+        return 1
+    write_export(fmt, args.output, args.source)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import logging
+import os
+import shutil
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pdfplumber
+from pdfplumber.table import TableFinder
+
+import stage_timing
+
+logger = logging.getLogger(__name__)
+
+# PyMuPDF is optional - without it every call falls back to pdfplumber
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# OCR of scanned pages is optional too: it needs pytesseract and the tesseract binary
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:
+    pytesseract = None
+
+if pytesseract is not None and os.getenv("TESSERACT_CMD"):
+    pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD")
+
+# Pages with fewer letters and digits than this in their text layer count as scanned
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "25"))
+
+# Scanned pages are rendered at this resolution and OCR'd this many at a time
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Seconds tesseract may spend on one page before it is given up (the page then stays empty)
+OCR_TIMEOUT = int(os.getenv("OCR_TIMEOUT", "60"))
+
+
+def pymupdf_available():
+    """Return True when PyMuPDF can be used for text extraction"""
+    return fitz is not None and hasattr(fitz, "open")
+
+
+def ocr_available():
+    """Return True when scanned pages can be rendered (PyMuPDF) and OCR'd (pytesseract + tesseract)"""
+    if not pymupdf_available() or pytesseract is None:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+def resolve_engine(engine="auto"):
+    """Map an engine name ('auto', 'pdfplumber', 'pymupdf', 'hybrid') to a concrete backend"""
+    engine = (engine or "auto").lower()
+
+    if engine == "auto":
+        if ocr_available():
+            return "hybrid"
+        return "pymupdf" if pymupdf_available() else "pdfplumber"
+
+    if engine not in EXTRACTION_ENGINES:
+        raise ValueError(f"Unknown extraction engine: {engine}")
+
+    if engine == "pymupdf" and not pymupdf_available():
+        raise ValueError("PyMuPDF (fitz) is not installed; use the 'pdfplumber' engine instead")
+
+    if engine == "hybrid" and not ocr_available():
+        raise ValueError("OCR needs PyMuPDF, pytesseract and the tesseract binary (TESSERACT_CMD)")
+
+    return engine
+
+
+def iter_pages_pdfplumber(pdf_path, pages=None):
+    """Yield (page_num, tables, text) for every page (or the 0-based pages given) using pdfplumber only"""
+    with pdfplumber.open(pdf_path, pages=[page_num + 1 for page_num in pages] if pages is not None else None) as pdf:
+        for page in pdf.pages:
+            yield page.page_number - 1, page.extract_tables(), page.extract_text()
+
+
+def make_edge(x0, top, x1, bottom, orientation, object_type):
+    """Build an edge dict in the shape pdfplumber's table finder expects"""
+    return {
+        "object_type": object_type,
+        "x0": x0,
+        "x1": x1,
+        "top": top,
+        "bottom": bottom,
+        "doctop": top,
+        "width": x1 - x0,
+        "height": bottom - top,
+        "orientation": orientation,
+    }
+
+
+def segment_to_edge(p0, p1, object_type):
+    """Convert a PyMuPDF line segment to an edge (pdfplumber treats non-horizontal lines as vertical)"""
+    x0, x1 = sorted((p0.x, p1.x))
+    top, bottom = sorted((p0.y, p1.y))
+    return make_edge(x0, top, x1, bottom, "h" if top == bottom else "v", object_type)
+
+
+def drawing_edges(fitz_page):
+    """Collect table-finding edges from the vector drawings of a PyMuPDF page"""
+    edges = []
+
+    for drawing in fitz_page.get_drawings():
+        for item in drawing["items"]:
+            op = item[0]
+            if op == "l":
+                edges.append(segment_to_edge(item[1], item[2], "line"))
+            elif op == "re":
+                rect = item[1]
+                edges.extend([
+                    make_edge(rect.x0, rect.y0, rect.x1, rect.y0, "h", "rect_edge"),
+                    make_edge(rect.x0, rect.y1, rect.x1, rect.y1, "h", "rect_edge"),
+                    make_edge(rect.x0, rect.y0, rect.x0, rect.y1, "v", "rect_edge"),
+                    make_edge(rect.x1, rect.y0, rect.x1, rect.y1, "v", "rect_edge"),
+                ])
+            elif op in ("qu", "c"):
+                # Quads and curves: one edge per side / control polygon segment
+                if op == "qu":
+                    quad = item[1]
+                    points = [quad.ul, quad.ur, quad.lr, quad.ll, quad.ul]
+                else:
+                    points = list(item[1:5])
+                edges.extend(segment_to_edge(a, b, "curve_edge") for a, b in zip(points, points[1:]))
+
+    return edges
+
+
+class DrawingPage:
+    """Minimal stand-in for a pdfplumber page, exposing only what TableFinder reads"""
+
+    def __init__(self, fitz_page):
+        rect = fitz_page.rect
+        self.bbox = (rect.x0, rect.y0, rect.x1, rect.y1)
+        self.edges = drawing_edges(fitz_page)
+
+
+def page_has_tables(fitz_page):
+    """
+    Run pdfplumber's table finder on edges read by PyMuPDF.
+
+    pdfplumber's default strategy builds tables purely from ruling lines and
+    rectangles, so this tells us whether a page has table regions without
+    paying for pdfminer's full layout parse of the page.
+    """
+    return bool(TableFinder(DrawingPage(fitz_page)).tables)
+
+
+def iter_pages_pymupdf(pdf_path, pages=None):
+    """
+    Yield (page_num, tables, text) using PyMuPDF for text and pdfplumber
+    only on pages that contain table regions. pages limits it to those
+    0-based page numbers.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num in range(len(doc)) if pages is None else pages:
+                plumber_page = pdf.pages[page_num]
+                fitz_page = doc.load_page(page_num)
+                text = fitz_page.get_text("text", sort=True)
+
+                tables = []
+                if page_has_tables(fitz_page):
+                    tables = plumber_page.extract_tables()
+                    # Release pdfplumber's cached layout objects as we go
+                    plumber_page.flush_cache()
+
+                yield page_num, tables, text
+    finally:
+        doc.close()
+
+
+def has_text_layer(text):
+    """True when a page's extracted text has enough letters and digits to be real content"""
+    return sum(char.isalnum() for char in text or '') >= OCR_MIN_TEXT_CHARS
+
+
+def render_page(fitz_page):
+    """Grayscale image of a page at OCR_DPI (raw pixels: encoding a PNG would cost more than rendering)"""
+    pixmap = fitz_page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+    return Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def ocr_image(image):
+    """Text tesseract reads from a page image ('' if it fails or times out)"""
+    try:
+        return pytesseract.image_to_string(image, timeout=OCR_TIMEOUT)
+    except Exception as e:
+        logger.warning("Error running OCR on page: %s", e)
+        return ''
+
+
+def ocr_scanned_pages(pdf_path, pages, page_text=None, from_ocr=None):
+    """
+    Pass (page_num, tables, content) pages through, replacing the content of
+    pages that have no usable text layer but do contain images (scanned
+    pages) with OCR output. page_text turns content into text for the check
+    and from_ocr turns OCR text into content (both default to plain text).
+
+    Scanned pages are rendered here and OCR'd on OCR_WORKERS threads (tesseract
+    runs as a separate process) while later pages keep being read. Pages are
+    still yielded in order; native-text pages pay no OCR cost.
+    """
+    page_text = page_text or (lambda content: content)
+    from_ocr = from_ocr or (lambda text: text)
+
+    executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    ocr = stage_timing.worker(ocr_image)
+    doc = fitz.open(pdf_path)
+    pending = deque()  # (page_num, tables, content or OCR future), in page order
+    ocr_pages = 0
+
+    def ready():
+        page_num, tables, content = pending.popleft()
+        if isinstance(content, Future):
+            content = from_ocr(content.result())
+        return page_num, tables, content
+
+    try:
+        for page_num, tables, content in pages:
+            fitz_page = None if has_text_layer(page_text(content)) else doc.load_page(page_num)
+            if fitz_page is not None and fitz_page.get_images():
+                pending.append((page_num, tables, executor.submit(ocr, render_page(fitz_page))))
+                ocr_pages += 1
+            else:
+                pending.append((page_num, tables, content))
+
+            # Hand over every page at the front of the queue whose content is ready
+            while pending and (not isinstance(pending[0][2], Future) or pending[0][2].done()):
+                yield ready()
+
+        while pending:
+            yield ready()
+
+        if ocr_pages:
+            logger.info("OCR'd %d scanned pages of %s", ocr_pages, os.path.basename(pdf_path))
+    finally:
+        doc.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_pages_hybrid(pdf_path, pages=None):
+    """Yield (page_num, tables, text) with PyMuPDF, OCR'ing only scanned pages (OCR'd pages have no tables)"""
+    return ocr_scanned_pages(pdf_path, iter_pages_pymupdf(pdf_path, pages))
+
+
+EXTRACTION_ENGINES = {
+    'pdfplumber': iter_pages_pdfplumber,
+    'pymupdf': iter_pages_pymupdf,
+    'hybrid': iter_pages_hybrid,
+}
+
+
+def iter_pages(pdf_path, engine="auto", pages=None):
+    """Yield (page_num, tables, text) for each page (or the 0-based pages given) with the selected engine"""
+    return EXTRACTION_ENGINES[resolve_engine(engine)](pdf_path, pages)
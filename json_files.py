@@ -0,0 +1,21 @@
+import json
+import os
+import tempfile
+
+
+def write_json_atomic(path, data):
+    """
+    Write data as JSON to path atomically: it goes to a temporary file in the
+    same directory that then replaces path, so concurrent readers never see a
+    partial file. Creates the directory if needed; errors are raised.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+import bedrock_cassette
+
+# The OpenAI SDK is optional - only the "openai" provider needs it
+try:
+    import openai
+except ImportError:
+    openai = None
+
+# Provider used when callers do not pick one: 'bedrock', 'openai' or 'fake'
+DEFAULT_PROVIDER = os.getenv("LLM_PROVIDER", "bedrock")
+
+# Limits applied to every provider
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+CONNECT_TIMEOUT = int(os.getenv("BEDROCK_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = int(os.getenv("BEDROCK_READ_TIMEOUT", "60"))
+
+# Default generation settings (low temperature for consistent summaries)
+DEFAULT_PARAMS = {'max_tokens': 500, 'temperature': 0.05, 'top_p': 0.6}
+
+LLAMA_PROMPT_FORMAT = "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n{system}<|eot_id|><|start_header_id|>user<|end_header_id|>\n{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n"
+
+
+class LLMBackend:
+    """
+    Base class for text generation providers.
+
+    Subclasses implement invoke() (and optionally ainvoke()). The base class
+    adds what every provider shares: one lazily created, pooled client, a
+    response cache, a concurrency limit and call metrics.
+
+      complete(prompt, system)   blocking call, safe from many threads
+      acomplete(prompt, system)  the same call for asyncio code
+    """
+    name = 'base'
+    label = 'LLM'
+
+    def __init__(self, model=None, max_concurrency=None, cache_size=None):
+        self.model = model or self.default_model()
+        self.max_concurrency = max_concurrency or MAX_CONCURRENCY
+        self.cache_size = CACHE_SIZE if cache_size is None else cache_size
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = weakref.WeakKeyDictionary()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {'calls': 0, 'cache_hits': 0, 'errors': 0, 'latency_seconds': 0.0,
+                         'prompt_chars': 0, 'completion_chars': 0}
+
+    def default_model(self):
+        return None
+
+    def create_client(self):
+        return None
+
+    @property
+    def client(self):
+        """Provider client, created on first use and shared by all calls"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+
+    def invoke(self, prompt, system, params):
+        raise NotImplementedError
+
+    async def ainvoke(self, prompt, system, params):
+        return await asyncio.to_thread(self.invoke, prompt, system, params)
+
+    # Cache and metrics
+
+    def cache_key(self, prompt, system, params):
+        payload = json.dumps([self.name, self.model, system, prompt, params], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cached(self, key):
+        if not self.cache_size:
+            return None
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+                self._metrics['cache_hits'] += 1
+            return text
+
+    def remember(self, key, text):
+        if not self.cache_size or not text:
+            return
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def record_call(self, prompt, text, elapsed, failed=False):
+        with self._lock:
+            self._metrics['calls'] += 1
+            self._metrics['latency_seconds'] += elapsed
+            self._metrics['prompt_chars'] += len(prompt)
+            if failed:
+                self._metrics['errors'] += 1
+            else:
+                self._metrics['completion_chars'] += len(text or '')
+
+    def metrics(self):
+        """Snapshot of call counts, cache hits, errors and latency"""
+        with self._lock:
+            snapshot = dict(self._metrics)
+        snapshot['provider'] = self.name
+        snapshot['model'] = self.model
+        snapshot['avg_latency_seconds'] = snapshot['latency_seconds'] / snapshot['calls'] if snapshot['calls'] else 0.0
+        return snapshot
+
+    # Calls
+
+    def complete(self, prompt, system="", **params):
+        params = {**DEFAULT_PARAMS, **params}
+        key = self.cache_key(prompt, system, params)
+        text = self.cached(key)
+        if text is not None:
+            return text
+
+        with self._slots:
+            start = time.perf_counter()
+            try:
+                text = self.invoke(prompt, system, params)
+            except Exception:
+                self.record_call(prompt, None, time.perf_counter() - start, failed=True)
+                raise
+        self.record_call(prompt, text, time.perf_counter() - start)
+        self.remember(key, text)
+        return text
+
+    def async_slots(self):
+        """Concurrency limit for the running event loop"""
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+    async def acomplete(self, prompt, system="", **params):
+        params = {**DEFAULT_PARAMS, **params}
+        key = self.cache_key(prompt, system, params)
+        text = self.cached(key)
+        if text is not None:
+            return text
+
+        async with self.async_slots():
+            start = time.perf_counter()
+            try:
+                text = await self.ainvoke(prompt, system, params)
+            except Exception:
+                self.record_call(prompt, None, time.perf_counter() - start, failed=True)
+                raise
+        self.record_call(prompt, text, time.perf_counter() - start)
+        self.remember(key, text)
+        return text
+
+
+class BedrockBackend(LLMBackend):
+    """Llama models on AWS Bedrock"""
+    name = 'bedrock'
+    label = 'Bedrock'
+
+    def default_model(self):
+        return os.getenv("BEDROCK_MODEL_ID") or bedrock_cassette.recorded_model()
+
+    def create_client(self):
+        # BEDROCK_CASSETTE=record|replay records calls to, or serves them from, a local cassette
+        return bedrock_cassette.wrap_client(self.create_bedrock_client)
+
+    def create_bedrock_client(self):
+        region = os.getenv("AWS_BEDROCK_REGION", os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
+        return boto3.client(
+            'bedrock-runtime',
+            region_name=region,
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            config=Config(
+                connect_timeout=CONNECT_TIMEOUT,
+                read_timeout=READ_TIMEOUT,
+                retries={'max_attempts': 2},
+                max_pool_connections=self.max_concurrency
+            )
+        )
+
+    def invoke(self, prompt, system, params):
+        if not self.model:
+            raise ValueError("BEDROCK_MODEL_ID not set in environment variables")
+        if "llama" not in self.model.lower():
+            raise ValueError(f"Expected Llama model, got {self.model}")
+
+        body = {
+            "prompt": LLAMA_PROMPT_FORMAT.format(system=system, prompt=prompt),
+            "max_gen_len": params['max_tokens'],
+            "temperature": params['temperature'],
+            "top_p": params['top_p'],
+        }
+        response = self.client.invoke_model(
+            modelId=self.model,
+            body=json.dumps(body),
+            contentType="application/json"
+        )
+        return json.loads(response['body'].read()).get('generation', '')
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI or any OpenAI-compatible chat completions endpoint (OPENAI_BASE_URL)"""
+    name = 'openai'
+    label = 'OpenAI'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def default_model(self):
+        return os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+    def client_options(self):
+        if openai is None:
+            raise ValueError("The openai package is not installed")
+        return {
+            'api_key': os.getenv("OPENAI_API_KEY"),
+            'base_url': os.getenv("OPENAI_BASE_URL") or None,
+            'timeout': READ_TIMEOUT,
+            'max_retries': 1,
+        }
+
+    def create_client(self):
+        return openai.OpenAI(**self.client_options())
+
+    def async_client(self):
+        # An async client's connection pool belongs to the event loop it was used on
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = openai.AsyncOpenAI(**self.client_options())
+        return client
+
+    def messages(self, prompt, system):
+        messages = [{"role": "system", "content": system}] if system else []
+        return messages + [{"role": "user", "content": prompt}]
+
+    def invoke(self, prompt, system, params):
+        response = self.client.chat.completions.create(
+            model=self.model, messages=self.messages(prompt, system), **params
+        )
+        return response.choices[0].message.content or ''
+
+    async def ainvoke(self, prompt, system, params):
+        response = await self.async_client().chat.completions.create(
+            model=self.model, messages=self.messages(prompt, system), **params
+        )
+        return response.choices[0].message.content or ''
+
+
+# Relative speed of the fake models, so offline runs show the effect of routing
+FAKE_MODEL_SPEED = {'fake': 1.0, 'fake-small': 0.3}
+
+# Requests per second the fake provider accepts across all fake backends (0: no limit)
+FAKE_RATE_LIMIT = float(os.getenv("FAKE_LLM_RATE_LIMIT", "0"))
+
+_fake_requests = deque()
+_fake_requests_lock = threading.Lock()
+
+
+def fake_throttle():
+    """Reject a fake call the way Bedrock does once FAKE_RATE_LIMIT requests arrived in the last second"""
+    if not FAKE_RATE_LIMIT:
+        return
+    now = time.monotonic()
+    with _fake_requests_lock:
+        while _fake_requests and now - _fake_requests[0] >= 1.0:
+            _fake_requests.popleft()
+        if len(_fake_requests) >= FAKE_RATE_LIMIT:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests'}},
+                              'InvokeModel')
+        _fake_requests.append(now)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Local stand-in that answers without a network. Each call takes
+    FAKE_LLM_LATENCY seconds, scaled by the model's FAKE_MODEL_SPEED and by
+    max_tokens / 500, so smaller models and shorter generations are faster.
+    FAKE_LLM_RATE_LIMIT adds provider-side throttling.
+    """
+    name = 'fake'
+    label = 'Fake LLM'
+
+    def default_model(self):
+        return 'fake'
+
+    def latency(self, params):
+        base = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+        return base * FAKE_MODEL_SPEED.get(self.model, 1.0) * params['max_tokens'] / DEFAULT_PARAMS['max_tokens']
+
+    def respond(self, prompt):
+        first_line = prompt.strip().split('\n')[0][:80]
+        return f"This is a placeholder summary for: {first_line}. The prompt had {len(prompt)} characters."
+
+    def invoke(self, prompt, system, params):
+        fake_throttle()
+        time.sleep(self.latency(params))
+        return self.respond(prompt)
+
+    async def ainvoke(self, prompt, system, params):
+        fake_throttle()
+        await asyncio.sleep(self.latency(params))
+        return self.respond(prompt)
+
+
+LLM_BACKENDS = {
+    'bedrock': BedrockBackend,
+    'openai': OpenAIBackend,
+    'fake': FakeBackend,
+}
+
+# One shared instance per provider and model, so clients, caches and limits are shared too
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(provider=None, model=None):
+    """Return the shared backend for a provider (LLM_PROVIDER by default) and model (its default)"""
+    provider = provider or DEFAULT_PROVIDER
+    if provider not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM provider '{provider}'. Choose from: {', '.join(LLM_BACKENDS)}")
+
+    with _instances_lock:
+        if (provider, model) not in _instances:
+            _instances[(provider, model)] = LLM_BACKENDS[provider](model=model)
+        return _instances[(provider, model)]
+
+
+def backend_metrics():
+    """metrics() of every shared backend created so far, including the routed models"""
+    with _instances_lock:
+        backends = list(_instances.values())
+    return [backend.metrics() for backend in backends]
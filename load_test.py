@@ -0,0 +1,221 @@
+import argparse
+import io
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boilerplate_index
+import deadlines
+import llm_backends
+import model_routing
+import stage_timing
+import statement_store
+import summary_history
+from processor import process_file
+
+SAMPLE_PDFS = ["sample-new-fidelity-acnt-stmt.pdf", "sample_statement.pdf", "document.pdf"]
+
+STAGES = ['extract', 'store', 'history', 'sections', 'overall']
+
+# How often the memory sampler reads the process's resident set size
+MEMORY_SAMPLE_SECONDS = 0.05
+
+
+class SimulatedUpload(io.BytesIO):
+    """Stands in for Streamlit's UploadedFile: name, type, getvalue() and read()"""
+
+    def __init__(self, data, name, file_type="application/pdf"):
+        super().__init__(data)
+        self.name = name
+        self.type = file_type
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (pct in 0-100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def rss_bytes():
+    """Current resident set size, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemorySampler(threading.Thread):
+    """Tracks the peak resident set size while a load level runs"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = rss_bytes() or 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(MEMORY_SAMPLE_SECONDS):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        # No /proc: fall back to the process-lifetime peak (kilobytes on Linux)
+        if not self.peak:
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return self.peak
+
+
+def run_upload(pdf_path, data, time_budget):
+    """Process one simulated upload; returns its latency, stage timings and outcome"""
+    upload = SimulatedUpload(data, os.path.basename(pdf_path))
+    start = time.perf_counter()
+    with stage_timing.record_stages() as timings:
+        result = process_file(upload, time_budget=time_budget)
+    elapsed = time.perf_counter() - start
+
+    statuses = {}
+    throttled = 0
+    if isinstance(result, dict) and 'error' not in result:
+        for section in result.values():
+            statuses[section['Status']] = statuses.get(section['Status'], 0) + 1
+            throttled += 'ThrottlingException' in section['Summary']
+    return {
+        'latency': elapsed,
+        'stages': timings,
+        'error': result.get('error') if isinstance(result, dict) else result,
+        'statuses': statuses,
+        'throttled': throttled,
+    }
+
+
+def run_level(concurrency, uploads, pdf_data, time_budget):
+    """Run uploads (cycling through the PDFs) with concurrency simultaneous users"""
+    model_routing.reset_routing_stats()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    sampler = MemorySampler()
+    sampler.start()
+
+    work = [pdf_data[i % len(pdf_data)] for i in range(uploads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda item: run_upload(item[0], item[1], time_budget), work))
+    wall = time.perf_counter() - start
+
+    peak_rss = sampler.stop()
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+
+    return {
+        'concurrency': concurrency,
+        'uploads': uploads,
+        'wall': wall,
+        'results': results,
+        'cpu_seconds': cpu,
+        'peak_rss': peak_rss,
+        'routes': model_routing.routing_report(),
+    }
+
+
+def latency_row(label, values):
+    return (f"    {label:<10} p50 {percentile(values, 50):7.2f}s  p95 {percentile(values, 95):7.2f}s  "
+            f"p99 {percentile(values, 99):7.2f}s  max {max(values, default=0):7.2f}s")
+
+
+def print_level(level):
+    results = level['results']
+    failed_uploads = [r for r in results if r['error']]
+    statuses = {}
+    for r in results:
+        for status, count in r['statuses'].items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    print(f"\n== concurrency {level['concurrency']} ({level['uploads']} uploads) ==")
+    print(f"  throughput   {level['uploads'] / level['wall']:.2f} uploads/s ({level['wall']:.2f}s wall)")
+    print(f"  uploads      {len(results) - len(failed_uploads)} ok, {len(failed_uploads)} failed")
+    print(f"  sections     " + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+          + f"; {sum(r['throttled'] for r in results)} throttled")
+    for route, stats in sorted(level['routes'].items()):
+        print(f"  LLM {route:<9}{stats['calls']} calls ({stats['errors']} errors), "
+              f"avg {stats['avg_latency_seconds']:.2f}s, max {stats['max_latency_seconds']:.2f}s")
+    print(f"  CPU          {level['cpu_seconds']:.2f}s, {level['cpu_seconds'] / level['wall']:.2f} cores on average")
+    print(f"  peak RSS     {level['peak_rss'] / 1024 / 1024:.0f} MB")
+    print("  latency")
+    print(latency_row('end-to-end', [r['latency'] for r in results]))
+    for name in STAGES:
+        values = [r['stages'][name] for r in results if name in r['stages']]
+        if values:
+            print(latency_row(name, values))
+
+    for r in failed_uploads[:3]:
+        print(f"  error: {r['error']}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Drive process_file with concurrent simulated uploads against the fake LLM provider")
+    parser.add_argument("pdfs", nargs="*", default=SAMPLE_PDFS, help="PDFs to upload (cycled)")
+    parser.add_argument("--concurrency", default="1,4,8",
+                        help="comma-separated numbers of simultaneous uploads to try (default 1,4,8)")
+    parser.add_argument("--uploads", type=int, default=0,
+                        help="uploads per concurrency level (default: 3 per concurrent user)")
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="seconds per fake LLM call at 500 tokens (default 0.5)")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="fake LLM requests per second before throttling (default 0: none)")
+    parser.add_argument("--llm-concurrency", type=int, default=0,
+                        help="LLM_MAX_CONCURRENCY for the run (default: the environment's)")
+    parser.add_argument("--time-budget", type=float, default=deadlines.DEFAULT_TIME_BUDGET,
+                        help="per-upload time budget in seconds (default PROCESS_TIME_BUDGET)")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache on")
+    parser.add_argument("--history", action="store_true",
+                        help="keep per-account summary reuse on (repeated PDFs then skip most calls)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Fake provider with the requested latency and throttling
+    llm_backends.DEFAULT_PROVIDER = 'fake'
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    llm_backends.FAKE_RATE_LIMIT = args.rate_limit
+    if args.llm_concurrency:
+        llm_backends.MAX_CONCURRENCY = args.llm_concurrency
+    if not args.cache:
+        llm_backends.CACHE_SIZE = 0
+
+    # Stores stay on (their cost is part of the pipeline) but write to a scratch directory
+    scratch = tempfile.mkdtemp(prefix="load_test_")
+    statement_store.DB_PATH = os.path.join(scratch, "statements.db")
+    boilerplate_index.INDEX_PATH = os.path.join(scratch, "boilerplate_index.json")
+    summary_history.HISTORY_DIR = os.path.join(scratch, "summary_history") if args.history else ""
+
+    pdf_data = []
+    for pdf_path in args.pdfs:
+        with open(pdf_path, "rb") as f:
+            pdf_data.append((pdf_path, f.read()))
+
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    print(f"Fake LLM: {args.latency}s per call, rate limit {args.rate_limit or 'none'}, "
+          f"LLM concurrency {llm_backends.MAX_CONCURRENCY}; scratch stores in {scratch}")
+
+    # One untimed upload so imports and first-use setup do not count
+    run_upload(pdf_data[0][0], pdf_data[0][1], args.time_budget)
+
+    for concurrency in levels:
+        uploads = args.uploads or concurrency * 3
+        print_level(run_level(concurrency, uploads, pdf_data, args.time_budget))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
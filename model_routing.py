@@ -0,0 +1,101 @@
+import os
+import threading
+
+from llm_backends import get_backend
+
+# Set MODEL_ROUTING=off to send every section to the standard route
+ROUTING_ENABLED = os.getenv("MODEL_ROUTING", "on").lower() not in ("off", "0", "false")
+
+# Sections with at most this much input (after cleanup and truncation) go to the small route
+SMALL_INPUT_CHARS = int(os.getenv("ROUTING_SMALL_INPUT_CHARS", "1500"))
+
+# Sections that rarely need a long answer get a larger allowance for the small route
+SHORT_ANSWER_SECTIONS = {'fees': 3000}
+
+# With less time than this left in the request budget, everything goes to the small route
+LOW_BUDGET_SECONDS = float(os.getenv("ROUTING_LOW_BUDGET_SECONDS", "20"))
+
+# Routes: generation length plus the model to use per provider.
+# A provider without a model listed uses its default model (BEDROCK_MODEL_ID, OPENAI_MODEL).
+MODEL_ROUTES = {
+    'small': {
+        'max_tokens': 200,
+        'models': {
+            'bedrock': os.getenv("BEDROCK_SMALL_MODEL_ID"),
+            'openai': os.getenv("OPENAI_SMALL_MODEL"),
+            'fake': 'fake-small',
+        },
+    },
+    'standard': {
+        'max_tokens': 500,
+        'models': {},
+    },
+    'overall': {
+        'max_tokens': 600,
+        'models': {},
+    },
+}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def choose_route(section_name, input_chars, time_left=None):
+    """Pick a route from the section type, its input size and the time left (seconds or None)"""
+    if not ROUTING_ENABLED:
+        return 'standard'
+
+    if section_name.startswith('overall'):
+        return 'overall'
+
+    if time_left is not None and time_left < LOW_BUDGET_SECONDS:
+        return 'small'
+
+    if input_chars <= SHORT_ANSWER_SECTIONS.get(section_name, SMALL_INPUT_CHARS):
+        return 'small'
+
+    return 'standard'
+
+
+def route_backend(llm, route):
+    """Backend for a route: the same provider as llm, on the route's model when one is set"""
+    model = MODEL_ROUTES[route]['models'].get(llm.name)
+    if not model or model == llm.model:
+        return llm
+    return get_backend(llm.name, model)
+
+
+def route_params(route):
+    return {'max_tokens': MODEL_ROUTES[route]['max_tokens']}
+
+
+def record_route(route, model, elapsed, failed=False):
+    """Count one call on a route and its latency"""
+    with _stats_lock:
+        stats = _stats.setdefault(route, {'calls': 0, 'errors': 0, 'latency_seconds': 0.0,
+                                          'max_latency_seconds': 0.0, 'models': set()})
+        stats['calls'] += 1
+        stats['errors'] += int(failed)
+        stats['latency_seconds'] += elapsed
+        stats['max_latency_seconds'] = max(stats['max_latency_seconds'], elapsed)
+        stats['models'].add(model or 'default')
+
+
+def routing_report():
+    """Per-route call counts, errors, models and average/max latency"""
+    with _stats_lock:
+        report = {}
+        for route, stats in _stats.items():
+            report[route] = {
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'models': sorted(stats['models']),
+                'avg_latency_seconds': stats['latency_seconds'] / stats['calls'],
+                'max_latency_seconds': stats['max_latency_seconds'],
+            }
+        return report
+
+
+def reset_routing_stats():
+    with _stats_lock:
+        _stats.clear()
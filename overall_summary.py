@@ -0,0 +1,92 @@
+import os
+import re
+
+# "overall_summary" is built either from the section summaries ("hierarchical")
+# or from the statement's raw text, truncated to the prompt limit ("direct")
+OVERALL_SUMMARY_MODE = os.getenv("OVERALL_SUMMARY_MODE", "hierarchical")
+
+# Labelled amounts such as "Ending Account Value $142,413.12" or "Total -$399.11"
+TOTAL_AMOUNT_RE = re.compile(r'\b((?:Total|Ending|Beginning|Net)\b[A-Za-z &/\-]{0,40}?)\s*(-?\$-?[\d,]+\.\d{2})')
+
+# Keep the reduce prompt small: a few totals per section and a bounded summary each
+MAX_TOTALS_PER_SECTION = 8
+MAX_SECTION_SUMMARY_CHARS = 800
+REDUCE_MAX_CHARS = 7000
+
+REDUCE_PROMPT = """Below are totals read directly from one brokerage statement, followed by summaries of each of its sections. Combine them into a comprehensive summary of the whole statement. Include:
+1. Total portfolio value and period-over-period change
+2. Key account balances
+3. Major transactions or activity
+4. Income/dividends received
+5. Notable performance highlights
+Prefer the listed totals over amounts in the section summaries when they disagree. Write in clear, complete sentences without using quotation marks or special formatting:"""
+
+
+def hierarchical_mode(mode=None):
+    return (mode or OVERALL_SUMMARY_MODE) != "direct"
+
+
+def section_text_items(content):
+    """Yield one string per text line or table row of a section"""
+    for item in content:
+        if isinstance(item, list):  # A table
+            for row in item:
+                yield ' '.join(str(cell) for cell in row if cell)
+        elif item:
+            yield str(item)
+
+
+def local_totals(sections, section_names):
+    """Return {section: [(label, amount), ...]} for labelled totals found in each section"""
+    totals = {}
+    for section_name in section_names:
+        found = []
+        for text in section_text_items(sections.get(section_name, [])):
+            for label, amount in TOTAL_AMOUNT_RE.findall(text):
+                fact = (' '.join(label.split()), amount)
+                if fact not in found:
+                    found.append(fact)
+            if len(found) >= MAX_TOTALS_PER_SECTION:
+                break
+        if found:
+            totals[section_name] = found[:MAX_TOTALS_PER_SECTION]
+    return totals
+
+
+def shorten(text, max_chars):
+    """Cut text at the last sentence end before max_chars"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    end = cut.rfind('. ')
+    return cut[:end + 1] if end > 0 else cut + "..."
+
+
+def build_reduce_input(summaries, totals, section_titles):
+    """
+    Build the overall-summary input from finished section summaries and the
+    locally computed totals. Sections whose summary failed are left out.
+    """
+    parts = []
+    for section_name, data in summaries.items():
+        summary = data['summary']
+        if section_name == 'overall_summary' or data.get('status', 'complete') != 'complete':
+            continue
+        if summary.startswith(("Error", "No meaningful", "No response")):
+            continue
+        title = section_titles.get(section_name, section_name.replace('_', ' ').title())
+        parts.append(f"{title}: {shorten(summary, MAX_SECTION_SUMMARY_CHARS)}")
+
+    if not parts:
+        return ""
+
+    facts = []
+    for section_name, found in totals.items():
+        title = section_titles.get(section_name, section_name.replace('_', ' ').title())
+        facts.extend(f"{title} - {label}: {amount}" for label, amount in found)
+
+    # Totals go first so they survive if the input has to be truncated
+    text = ""
+    if facts:
+        text = "Totals from the statement:\n" + '\n'.join(facts) + "\n\n"
+    return text + "Section summaries:\n" + '\n'.join(parts)
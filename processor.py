@@ -1,58 +1,30 @@
 import PyPDF2
 import pdfplumber
 import re
-import json
 from typing import List, Dict, Any
 import tempfile
 import os
 from dotenv import load_dotenv
-import boto3
-from botocore.exceptions import ClientError
+from extraction_engines import iter_pages
+from statement_templates import match_template, iter_template_pages
+from text_normalization import normalize_input_text, normalize_llm_output
+import summary_history
+import boilerplate_index
+import overall_summary
+import statement_store
+import threading
+import time
+import deadlines
+import stage_timing
+from section_names import SECTION_NAMES, SECTION_TITLES
+import profiling
+import document_index
+from llm_backends import get_backend
+import model_routing
 
 # Load environment variables from .env file
 load_dotenv('/etc/environment')
 
-# Initialize AWS Bedrock client
-def get_bedrock_client():
-    """Initialize AWS Bedrock client"""
-    try:
-        # Get region from environment or use default
-        region = os.getenv("AWS_BEDROCK_REGION", os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
-        
-        bedrock_client = boto3.client(
-            'bedrock-runtime',
-            region_name=region,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-        )
-        return bedrock_client
-    except Exception as e:
-        raise ValueError(f"Failed to initialize Bedrock client: {str(e)}")
-
-client = get_bedrock_client()
-
-def clean_extracted_text(text):
-    """Clean and improve extracted text from PDF"""
-    if not text:
-        return text
-    
-    # Fix common PDF extraction issues
-    # Add spaces around numbers and currency symbols
-    text = re.sub(r'(\d)([A-Za-z])', r'\1 \2', text)
-    text = re.sub(r'([A-Za-z])(\d)', r'\1 \2', text)
-    text = re.sub(r'(\$)([A-Za-z])', r'\1 \2', text)
-    
-    # Fix concatenated words (basic heuristic)
-    # Look for lowercase letter followed by uppercase letter
-    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-    
-    # Clean up multiple spaces
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove any potential HTML/markdown artifacts
-    text = re.sub(r'[*_`#]', '', text)
-    
-    return text.strip()
 
 def extract_pdf_with_structure(pdf_path):
     sections = {}
@@ -65,7 +37,7 @@ def extract_pdf_with_structure(pdf_path):
                 continue
             
             # Clean the extracted text
-            text = clean_extracted_text(text)
+            text = normalize_input_text(text)
             lines = text.split('\n')
             
             for line in lines:
@@ -91,182 +63,202 @@ def extract_pdf_with_structure(pdf_path):
     
     return sections
 
-def extract_tables_and_sections(pdf_path):
-    """Extract content and organize by logical sections instead of pages"""
-    sections = {
-        'dividends': [],
-        'transactions': [],
-        'positions': [],
-        'fees': [],
-        'performance': [],
-        'account_summary': [],
-        'other': []
-    }
+# Concurrent model calls per statement when summarizing its sections
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+
+# Share of the remaining time budget held back for the hierarchical overall summary
+OVERALL_BUDGET_SHARE = 0.25
+
+def categorize_table(table):
+    """Return the section a table belongs to based on its header row"""
+    headers = [str(cell).lower() if cell else '' for cell in table[0]]
+
+    if any('dividend' in h or 'distribution' in h for h in headers):
+        return 'dividends'
+    elif any(('symbol' in h and 'qty' in h) or 'position' in h for h in headers):
+        return 'positions'
+    elif any('trade' in h or 'buy' in h or 'sell' in h or 'transaction' in h for h in headers):
+        return 'transactions'
+    elif any('fee' in h or 'charge' in h or 'commission' in h for h in headers):
+        return 'fees'
+    return 'other'
+
+def account_numbers(text):
+    return sorted(set(summary_history.ACCOUNT_NUMBER_RE.findall(text)))
+
+def new_sections():
+    """Empty section lists, plus the page each item came from (for statement_store.py)"""
+    sections = {name: [] for name in SECTION_NAMES}
+    sections['item_pages'] = {name: [] for name in SECTION_NAMES}
+    sections['page_accounts'] = {}
+    return sections
+
+def add_to_section(sections, section, item, page_num):
+    sections[section].append(item)
+    sections['item_pages'][section].append(page_num)
+
+def strip_boilerplate_lines(pages, get_text=None, use_corpus=True):
+    """Drop running headers/footers and corpus boilerplate; what it saved is in the returned report"""
+    return boilerplate_index.strip_boilerplate(pages, get_text, index_path=None if use_corpus else "")
+
+def collect_pages(page_iter, deadline, stage="extraction"):
+    """Read pages until done, stopping when the time budget runs out"""
+    pages = []
+    for page in stage_timing.timed_pages(page_iter):
+        deadlines.check_deadline(deadline, stage)
+        pages.append(page)
+    return pages
+
+def extract_template_sections(pdf_path, template_name, remove_boilerplate=True, deadline=None, pages=None):
+    """Extract sections for a statement whose layout matches a known template"""
+    sections = new_sections()
+    sections['template'] = template_name
+    all_text = ""
+    report = None
+    page_nums = pages
+
+    try:
+        pages = collect_pages(iter_template_pages(pdf_path, template_name, page_nums), deadline)
+        # Account numbers are read before boilerplate removal drops repeated page headers
+        for page_num, _, lines in pages:
+            sections['page_accounts'][page_num] = account_numbers(' '.join(line for _, line in lines))
+        if remove_boilerplate:
+            # Part of a statement says little about which lines recur across statements
+            page_lines, report = strip_boilerplate_lines([lines for _, _, lines in pages], get_text=lambda item: item[1],
+                                                         use_corpus=page_nums is None)
+            pages = [(page_num, tables, lines) for (page_num, tables, _), lines in zip(pages, page_lines)]
+
+        for page_num, tables, section_lines in pages:
+            for table in tables:
+                if table and table[0]:
+                    add_to_section(sections, categorize_table(table), table, page_num)
+
+            # The template already knows which section every line belongs to
+            page_lines = []
+            for section, line in section_lines:
+                line = normalize_input_text(line)
+                if line:
+                    add_to_section(sections, section, line, page_num)
+                    page_lines.append(line)
+
+            if page_lines:
+                all_text += ' '.join(page_lines) + "\n"
+
+    except deadlines.TimeBudgetExceeded as e:
+        return {'error': str(e), 'status': deadlines.TIMED_OUT}
+    except Exception as e:
+        print(f"Error extracting sections with template {template_name}: {e}")
+        return {'error': f"Could not extract structured data: {e}"}
+
+    sections['overall_text'] = all_text
+    if report:
+        sections['boilerplate'] = report
+
+    return sections
+
+def extract_tables_and_sections(pdf_path, engine="auto", use_templates=True, remove_boilerplate=True, deadline=None,
+                                pages=None):
+    """
+    Extract content and organize by logical sections instead of pages
+
+    engine selects the text backend: 'pdfplumber', 'pymupdf' (PyMuPDF text,
+    pdfplumber only for table regions) or 'auto' to use PyMuPDF when installed.
+    Statements matching a known broker template (see statement_templates.py)
+    skip generic table finding and keyword-based section guessing; they are
+    read with the template's own pdfplumber page regions, so engine is
+    ignored for them. Pass use_templates=False to compare engines.
+    remove_boilerplate drops repeated headers/footers and disclosures (see
+    boilerplate_index.py) and reports the savings under 'boilerplate'.
+    deadline (see deadlines.py) stops extraction with a timed-out error.
+    pages (0-based page numbers) reads only those pages; see extract_targeted_sections.
+    """
+    if use_templates:
+        template_name = match_template(pdf_path)
+        if template_name:
+            return extract_template_sections(pdf_path, template_name, remove_boilerplate, deadline, pages)
+
+    sections = new_sections()
     
     all_text = ""  # Collect all text for overall summary
+    report = None
+    page_nums = pages
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                # Extract tables and categorize them
-                tables = page.extract_tables()
+        pages = collect_pages(iter_pages(pdf_path, engine, page_nums), deadline)
+        for page_num, _, text in pages:
+            sections['page_accounts'][page_num] = account_numbers(text or '')
+        if remove_boilerplate:
+            page_lines, report = strip_boilerplate_lines([(text or '').split('\n') for _, _, text in pages],
+                                                         use_corpus=page_nums is None)
+            pages = [(page_num, tables, '\n'.join(lines)) for (page_num, tables, _), lines in zip(pages, page_lines)]
+        
+        for page_num, tables, text in pages:
+            # Categorize tables found on the page
+            for table in tables:
+                if table and table[0]:  # Check if table has headers
+                    add_to_section(sections, categorize_table(table), table, page_num)
+            
+            # Categorize text
+            if text:
+                # Normalized per line: normalizing the page at once would collapse it into one line
+                lines = [line for line in (normalize_input_text(line) for line in text.split('\n')) if line]
+                all_text += '\n'.join(lines) + "\n"
                 
-                for i, table in enumerate(tables):
-                    if table and table[0]:  # Check if table has headers
-                        headers = [str(cell).lower() if cell else '' for cell in table[0]]
-                        
-                        # Categorize table based on headers
-                        if any('dividend' in h or 'distribution' in h for h in headers):
-                            sections['dividends'].append(table)
-                        elif any(('symbol' in h and 'qty' in h) or 'position' in h for h in headers):
-                            sections['positions'].append(table)
-                        elif any('trade' in h or 'buy' in h or 'sell' in h or 'transaction' in h for h in headers):
-                            sections['transactions'].append(table)
-                        elif any('fee' in h or 'charge' in h or 'commission' in h for h in headers):
-                            sections['fees'].append(table)
-                        else:
-                            sections['other'].append(table)
+                # Categorize text by content
+                current_section = 'other'
                 
-                # Extract and categorize text
-                text = page.extract_text()
-                if text:
-                    cleaned_text = clean_extracted_text(text)
-                    all_text += cleaned_text + "\n"
+                for line in lines:
+                    line = line.strip()
+                    if not line:
+                        continue
                     
-                    # Categorize text by content
-                    lines = cleaned_text.split('\n')
-                    current_section = 'other'
+                    # Identify section based on content
+                    line_lower = line.lower()
+                    if any(keyword in line_lower for keyword in ['dividend', 'distribution', 'reinvestment']):
+                        current_section = 'dividends'
+                    elif any(keyword in line_lower for keyword in ['trade', 'transaction', 'buy', 'sell', 'purchase']):
+                        current_section = 'transactions'
+                    elif any(keyword in line_lower for keyword in ['position', 'holding', 'shares', 'quantity', 'portfolio']):
+                        current_section = 'positions'
+                    elif any(keyword in line_lower for keyword in ['fee', 'charge', 'commission', 'expense']):
+                        current_section = 'fees'
+                    elif any(keyword in line_lower for keyword in ['gain', 'loss', 'return', 'performance', 'change']):
+                        current_section = 'performance'
+                    elif any(keyword in line_lower for keyword in ['account summary', 'portfolio value', 'total value', 'balance']):
+                        current_section = 'account_summary'
                     
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        # Identify section based on content
-                        line_lower = line.lower()
-                        if any(keyword in line_lower for keyword in ['dividend', 'distribution', 'reinvestment']):
-                            current_section = 'dividends'
-                        elif any(keyword in line_lower for keyword in ['trade', 'transaction', 'buy', 'sell', 'purchase']):
-                            current_section = 'transactions'
-                        elif any(keyword in line_lower for keyword in ['position', 'holding', 'shares', 'quantity', 'portfolio']):
-                            current_section = 'positions'
-                        elif any(keyword in line_lower for keyword in ['fee', 'charge', 'commission', 'expense']):
-                            current_section = 'fees'
-                        elif any(keyword in line_lower for keyword in ['gain', 'loss', 'return', 'performance', 'change']):
-                            current_section = 'performance'
-                        elif any(keyword in line_lower for keyword in ['account summary', 'portfolio value', 'total value', 'balance']):
-                            current_section = 'account_summary'
-                        
-                        sections[current_section].append(line)
+                    add_to_section(sections, current_section, line, page_num)
     
+    except deadlines.TimeBudgetExceeded as e:
+        return {'error': str(e), 'status': deadlines.TIMED_OUT}
     except Exception as e:
         print(f"Error extracting tables and sections: {e}")
         return {'error': f"Could not extract structured data: {e}"}
     
     # Add overall text for summary
     sections['overall_text'] = all_text
+    if report:
+        sections['boilerplate'] = report
     
     return sections
 
-def clean_and_align_text(text):
-    """Enhanced text cleaning and alignment function"""
-    if not text:
-        return text
-    
-    # Remove any leading/trailing whitespace
-    text = text.strip()
-    
-    # Remove markdown formatting artifacts
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Remove bold
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Remove italic
-    text = re.sub(r'`(.*?)`', r'\1', text)        # Remove code
-    text = re.sub(r'#{1,6}\s*(.*)', r'\1', text)  # Remove headers
-    text = re.sub(r'^[>\-\*\+\s]*', '', text, flags=re.MULTILINE)  # Remove leading symbols per line
-    
-    # Clean up bullet points and list formatting
-    text = re.sub(r'^\s*[-\*\+]\s*', '• ', text, flags=re.MULTILINE)  # Standardize bullets
-    text = re.sub(r'^\s*\d+\.\s*', lambda m: f"{m.group().strip()} ", text, flags=re.MULTILINE)  # Clean numbered lists
-    
-    # Fix spacing around currency and numbers
-    text = re.sub(r'\$\s*(\d)', r'$\1', text)  # Fix "$" spacing
-    text = re.sub(r'(\d)\s*%', r'\1%', text)   # Fix "%" spacing
-    text = re.sub(r'(\d),\s*(\d{3})', r'\1,\2', text)  # Fix comma separators
-    
-    # Normalize whitespace while preserving paragraph breaks
-    lines = text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Clean each line individually
-        line = re.sub(r'\s+', ' ', line.strip())
-        
-        # Skip empty lines but preserve intentional paragraph breaks
-        if line or (cleaned_lines and cleaned_lines[-1]):
-            cleaned_lines.append(line)
-    
-    # Join lines back together, preserving paragraph structure
-    text = '\n'.join(cleaned_lines)
-    
-    # Remove excessive line breaks (more than 2 consecutive)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # Ensure sentences end with proper punctuation
-    text = re.sub(r'([a-zA-Z0-9])\s*$', r'\1.', text, flags=re.MULTILINE)
-    
-    return text.strip()
-
-
-def format_summary_for_display(summary_text, section_name):
-    """Format summary text specifically for clean display"""
-    
-    # Apply base cleaning
-    formatted_text = clean_and_align_text(summary_text)
-    
-    # Section-specific formatting
-    if section_name.lower() in ['dividends', 'transactions', 'positions']:
-        # For financial sections, ensure currency amounts are properly formatted
-        formatted_text = re.sub(r'\$(\d+(?:,\d{3})*(?:\.\d{2})?)', r'$\1', formatted_text)
-        
-        # Standardize percentage formatting
-        formatted_text = re.sub(r'(\d+(?:\.\d+)?)\s*%', r'\1%', formatted_text)
-    
-    # Split into sentences for better readability
-    sentences = re.split(r'(?<=[.!?])\s+', formatted_text)
-    
-    # Clean each sentence
-    clean_sentences = []
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if sentence and len(sentence) > 3:  # Skip very short fragments
-            # Ensure proper capitalization
-            sentence = sentence[0].upper() + sentence[1:] if len(sentence) > 1 else sentence.upper()
-            clean_sentences.append(sentence)
-    
-    # Rejoin with consistent spacing
-    return ' '.join(clean_sentences)
-
+def extract_targeted_sections(pdf_path, section_names, engine="auto", deadline=None):
+    """
+    Extract only the pages that hold the given sections, located with the
+    cached outline/heading index (see document_index.py). Falls back to
+    reading every page when the index cannot place a section.
 
-def clean_ai_response(response_text):
-    """Enhanced AI response cleaning with better alignment"""
-    if not response_text:
-        return response_text
-    
-    # Remove common AI artifacts
-    response_text = re.sub(r'^(Here\'s|Here is|Based on|According to).*?[:\.]?\s*', '', response_text, flags=re.IGNORECASE)
-    response_text = re.sub(r'(In summary|To summarize|In conclusion)[:\.]?\s*', '', response_text, flags=re.IGNORECASE)
-    
-    # Apply standard cleaning
-    response_text = clean_and_align_text(response_text)
-    
-    # Remove any remaining formatting artifacts
-    response_text = re.sub(r'^\s*[>\-\*\+]\s*', '', response_text, flags=re.MULTILINE)
-    response_text = re.sub(r'\s+([.!?])', r'\1', response_text)  # Fix punctuation spacing
-    
-    # Ensure proper sentence structure
-    response_text = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', response_text)
-    
-    return response_text.strip()
+    The result has the usual sections structure plus 'pages_read' (1-based
+    page ranges, or None for all pages).
+    """
+    pages = document_index.section_pages(document_index.load_index(pdf_path), section_names)
+    sections = extract_tables_and_sections(pdf_path, engine, deadline=deadline, pages=pages)
+    if 'error' not in sections:
+        sections['pages_read'] = document_index.page_ranges(pages) if pages is not None else None
+    return sections
 
+# Part of the key stored summaries are reused under; bump it when the prompts below change
+PROMPT_VERSION = 1
 
 # Updated system prompt for better consistency
 SYSTEM_PROMPT_TEMPLATE = """You are a professional financial analyst. Provide clear, well-structured summaries of brokerage statement sections.
@@ -288,78 +280,70 @@ CONTENT FOCUS:
 - Provide context for significant changes or activity"""
 
 
-def call_llama_bedrock(prompt, section_name, model_arn=None):
-    """Enhanced Bedrock call with better formatting controls"""
-    
-    if model_arn is None:
-        model_arn = os.getenv("BEDROCK_MODEL_ID")
-        if not model_arn:
-            return "Error: BEDROCK_MODEL_ID not set in environment variables"
+def call_llm(prompt, section_name, llm=None, deadline=None, route=None):
+    """
+    Generate text with the configured LLM backend (llm_backends.py) and clean
+    the response for display. llm defaults to the LLM_PROVIDER backend; route
+    (see model_routing.py) switches the model and generation length.
+    """
+    llm = llm or get_backend()
+    params = {}
+    if route:
+        llm = model_routing.route_backend(llm, route)
+        params = model_routing.route_params(route)
     
-    if "llama" not in model_arn.lower():
-        return f"Error: Expected Llama model, got {model_arn}"
+    # Work queued behind a stuck call should not start once the budget is gone
+    if deadlines.expired(deadline):
+        return f"Error: time budget exhausted before calling {llm.label}"
     
+    start = time.perf_counter()
     try:
-        # Use the enhanced system prompt
-        formatted_prompt = f"<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n{SYSTEM_PROMPT_TEMPLATE}<|eot_id|><|start_header_id|>user<|end_header_id|>\n{prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n"
-        
-        # Optimized parameters for cleaner output
-        body = {
-            "prompt": formatted_prompt,
-            "max_gen_len": 500,      # Increased for complete responses
-            "temperature": 0.05,     # Very low for consistency
-            "top_p": 0.6,           # Focused responses
-        }
-        
-        response = client.invoke_model(
-            modelId=model_arn,
-            body=json.dumps(body),
-            contentType="application/json"
-        )
-        
-        response_body = json.loads(response['body'].read())
-        generated_text = response_body.get('generation', '')
+        generated_text = llm.complete(prompt, system=SYSTEM_PROMPT_TEMPLATE, **params)
+        if route:
+            model_routing.record_route(route, llm.model, time.perf_counter() - start)
         
         if generated_text:
-            # Apply enhanced cleaning
-            clean_text = clean_ai_response(generated_text)
-            
-            # Apply section-specific formatting
-            formatted_text = format_summary_for_display(clean_text, section_name)
-            
-            return formatted_text
+            # Clean and format the response for display in a single pass
+            return normalize_llm_output(generated_text)
         else:
             return "No response generated"
             
     except Exception as e:
-        return f"Error calling Bedrock: {str(e)}"
-
-def summarize_section(section_name: str, content: Any, bedrock_client):
-    """Summarize a specific section using AWS Bedrock Llama model"""
-    
-    # Convert content to string based on type
-    if isinstance(content, list):
-        if len(content) > 0 and isinstance(content[0], list):  # It's a list of tables
-            content_str = ""
-            for table in content:
-                table_str = '\n'.join(['\t'.join([str(cell) if cell else '' for cell in row]) for row in table])
-                content_str += table_str + "\n\n"
-        else:  # It's a list of text lines
-            content_str = '\n'.join(str(item) for item in content if item)
-    else:
-        content_str = str(content)
+        if route:
+            model_routing.record_route(route, llm.model, time.perf_counter() - start, failed=True)
+        return f"Error calling {llm.label}: {str(e)}"
+
+def section_text(lines, max_chars=4000):
+    """
+    The truncated text that goes into the prompt, from a section's normalized
+    lines (summary_history.section_lines, which is the only input cleanup)
+    """
+    content_str = ' '.join(lines)
     
-    # Clean the content before sending to AI
-    content_str = clean_extracted_text(content_str)
+    # Truncate content if too long (models have token limits)
+    if len(content_str) > max_chars:
+        content_str = content_str[:max_chars] + "... (truncated)"
+    
+    return content_str
+
+def summarize_section(section_name: str, content: Any, llm, previous=None, lines=None, max_chars=4000,
+                      deadline=None, route=None):
+    """
+    Summarize a specific section with the LLM backend (llm, default LLM_PROVIDER)
+
+    previous ({'summary', 'lines'} from the account's last statement) and the
+    section's normalized lines switch to a prompt that only sends what changed.
+    lines are computed from content when not given.
+    route picks the model and generation length (see model_routing.py).
+    """
+    if lines is None:
+        lines = summary_history.section_lines(content)
+    content_str = section_text(lines, max_chars)
     
     # Skip if content is too short or empty
     if len(content_str.strip()) < 20:
         return f"No meaningful {section_name} data found"
     
-    # Truncate content if too long (Bedrock has token limits)
-    if len(content_str) > 4000:
-        content_str = content_str[:4000] + "... (truncated)"
-    
     # Context-specific prompts with clearer instructions
     prompts = {
         'overall_summary': """Analyze this complete brokerage statement and provide a comprehensive summary. Include:
@@ -370,6 +354,8 @@ def summarize_section(section_name: str, content: Any, bedrock_client):
 5. Notable performance highlights
 Write in clear, complete sentences without using quotation marks or special formatting:""",
         
+        'overall_from_sections': overall_summary.REDUCE_PROMPT,
+        
         'dividends': """Analyze the dividend and distribution information. Summarize:
 1. Total dividends/distributions received
 2. Companies that paid dividends
@@ -415,58 +401,153 @@ Write in clear, complete sentences:""",
     prompt = prompts.get(section_name, f"Analyze and summarize this {section_name} information from the brokerage statement in clear, complete sentences:")
     full_prompt = f"{prompt}\n\nData to analyze:\n{content_str}"
     
-    system_prompt = """You are a professional financial analyst. Provide clear, concise summaries of brokerage statement sections. 
-
-IMPORTANT RULES:
-- Write in complete sentences that end with periods
-- Do NOT use quotation marks, asterisks, or special formatting
-- Do NOT start responses with '>' or other symbols
-- Focus on key numbers, amounts, and insights
-- Ensure proper spacing around currency amounts
-- Keep responses complete and well-structured"""
+    if previous and lines is not None:
+        delta_prompt = summary_history.build_delta_prompt(prompt, previous, lines)
+        if delta_prompt:
+            full_prompt = delta_prompt
     
     try:
-        # Call Llama via Bedrock
-        response_text = call_llama_bedrock(full_prompt, system_prompt)
-        
-        # Additional cleaning of AI response
-        clean_response = clean_ai_response(response_text)
-        
-        # Remove any remaining formatting artifacts
-        clean_response = re.sub(r'^[>\-\*\+\s]*', '', clean_response)  # Remove leading symbols
-        clean_response = re.sub(r'\s+', ' ', clean_response)  # Normalize spaces
-        clean_response = clean_response.strip()
-        
-        return clean_response
+        # Call the LLM backend; the response comes back cleaned and formatted
+        return call_llm(full_prompt, section_name, llm, deadline=deadline, route=route)
     
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
-def process_brokerage_statement(pdf_path, bedrock_client):
+# Section workers record into the account's history while the caller may be saving it
+HISTORY_LOCK = threading.Lock()
+
+def summarize_with_history(section_name, content, llm, history, max_chars=4000, deadline=None, route=None,
+                           lines=None):
+    """
+    Summarize a section, reusing the account's stored summary when the
+    section's normalized content, the model, the route and the prompt version
+    are unchanged. Returns (summary, reused).
+    """
+    if lines is None:
+        lines = summary_history.section_lines(content)
+    if history is None:
+        return summarize_section(section_name, content, llm, lines=lines, max_chars=max_chars, deadline=deadline,
+                                 route=route), False
+    
+    backend = llm or get_backend()
+    if route:
+        backend = model_routing.route_backend(backend, route)
+    digest = summary_history.summary_key(lines, f"{backend.name}/{backend.model}", route, PROMPT_VERSION)
+    
+    stored = summary_history.find_summary(history, section_name, digest)
+    if stored:
+        return stored, True
+    
+    previous = summary_history.previous_section(history, section_name)
+    summary = summarize_section(section_name, content, llm, previous=previous, lines=lines,
+                                max_chars=max_chars, deadline=deadline, route=route)
+    
+    # Only keep real summaries; errors and "no data" messages should be retried next time
+    if not summary.startswith(("Error", "No meaningful", "No response")):
+        with HISTORY_LOCK:
+            summary_history.record_summary(history, section_name, digest, lines, summary)
+    
+    return summary, False
+
+def summary_result(section_name, content, llm, history, max_chars=4000, deadline=None):
+    """Summarize one section into the {'summary', 'reused', 'status', 'route'} dict returned to callers"""
+    label = "overall summary" if section_name.startswith('overall') else section_name
+    try:
+        # Normalize once; route on what the model would actually see, and on the time left
+        lines = summary_history.section_lines(content)
+        route = model_routing.choose_route(section_name, len(section_text(lines, max_chars)),
+                                           deadlines.remaining(deadline))
+        summary, reused = summarize_with_history(section_name, content, llm, history, max_chars, deadline, route,
+                                                 lines)
+    except Exception as e:
+        return {'summary': f"Error summarizing {label}: {e}", 'status': deadlines.FAILED}
+    
+    if summary.startswith("Error"):
+        status = deadlines.TIMED_OUT if deadlines.expired(deadline) else deadlines.FAILED
+    else:
+        status = deadlines.COMPLETE
+    return {'summary': summary, 'reused': reused, 'status': status, 'route': route}
+
+def timed_out_result(section_name):
+    label = "overall summary" if section_name.startswith('overall') else SECTION_TITLES.get(section_name, section_name)
+    return {'summary': f"Timed out before the {label} summary finished", 'status': deadlines.TIMED_OUT}
+
+def summarize_jobs(jobs, llm, history, deadline, max_chars=4000):
+    """Summarize {section: content} concurrently, marking sections the deadline cut off"""
+    finished, unfinished = deadlines.run_jobs(
+        {section_name: (summary_result, (section_name, content, llm, history, max_chars, deadline))
+         for section_name, content in jobs.items()},
+        deadline,
+        SUMMARY_WORKERS
+    )
+    for section_name in unfinished:
+        finished[section_name] = timed_out_result(section_name)
+    return {section_name: finished[section_name] for section_name in jobs}
+
+def process_brokerage_statement(pdf_path, llm, use_history=True, overall_mode=None,
+                                use_store=True, source=None, time_budget=None, profile_dir=None):
+    """
+    Summarize every section of a statement, then the statement as a whole.
+
+    Section summaries run in parallel. In the default "hierarchical" mode the
+    overall summary is built afterwards from the section summaries and totals
+    read from the statement; "direct" summarizes the truncated raw text
+    instead (see overall_summary.py). The extracted data is also written to
+    statement_store.py under source (default: the file name).
+
+    time_budget (seconds) bounds the whole call: when it runs out, pending
+    summaries are cancelled and the ones finished so far are returned. Every
+    summary carries a status of 'complete', 'timed_out' or 'failed'.
+
+    profile_dir (or PIPELINE_PROFILE_DIR) writes a profile of the call there
+    (see profiling.py).
+    """
+    with profiling.profile_pipeline(source or os.path.basename(pdf_path), profile_dir):
+        return summarize_statement(pdf_path, llm, use_history, overall_mode, use_store, source, time_budget)
+
+def summarize_statement(pdf_path, llm, use_history=True, overall_mode=None,
+                        use_store=True, source=None, time_budget=None):
+    """The work of process_brokerage_statement, without the profiling switch"""
+    deadline = deadlines.make_deadline(time_budget)
+    
     # Extract sections organized by content type
-    sections = extract_tables_and_sections(pdf_path)
+    with stage_timing.stage('extract'):
+        sections = extract_tables_and_sections(pdf_path, deadline=deadline)
     
     if 'error' in sections:
         return sections
     
-    # Generate overall summary first
-    overall_text = sections.get('overall_text', '')
-    summaries = {}
-    
-    if overall_text and len(overall_text.strip()) > 100:
+    # Keep the extracted records queryable and searchable across statements
+    statement_id = None
+    if use_store and statement_store.store_enabled():
         try:
-            overall_summary = summarize_section('overall_summary', overall_text, bedrock_client)
-            summaries['overall_summary'] = {
-                'summary': overall_summary
-            }
+            with stage_timing.stage('store'):
+                statement_id = statement_store.save_statement(sections, source=source or os.path.basename(pdf_path),
+                                                              section_names=SECTION_NAMES,
+                                                              file_hash=document_index.file_digest(pdf_path))
         except Exception as e:
-            summaries['overall_summary'] = {
-                'summary': f"Error generating overall summary: {e}"
-            }
+            print(f"Error saving statement data: {e}")
+    
+    overall_text = sections.get('overall_text', '')
+    hierarchical = overall_summary.hierarchical_mode(overall_mode)
+    
+    # Load what was summarized for this account's previous statements
+    account = None
+    history = None
+    if use_history and summary_history.history_enabled():
+        account = summary_history.account_key(overall_text)
+        if account:
+            with stage_timing.stage('history'):
+                history = summary_history.load_history(account)
     
     # Process each section (excluding overall_text and empty sections)
     section_order = ['dividends', 'transactions', 'positions', 'fees', 'performance', 'account_summary', 'other']
     
+    jobs = {}
+    if not hierarchical and overall_text and len(overall_text.strip()) > 100:
+        # Passed as lines: overall_text is built from lines normalized at extraction
+        jobs['overall_summary'] = overall_text.split('\n')
+    
     for section_name in section_order:
         content = sections.get(section_name, [])
         
@@ -479,23 +560,78 @@ def process_brokerage_statement(pdf_path, bedrock_client):
         if len(content_str.strip()) < 50:
             continue
         
+        jobs[section_name] = content
+    
+    # Sections are independent, so their model calls run concurrently. A stuck
+    # section must not use up the time the overall summary needs afterwards.
+    section_deadline = deadline
+    if hierarchical and deadline is not None:
+        section_deadline = deadline - deadlines.remaining(deadline) * OVERALL_BUDGET_SHARE
+    with stage_timing.stage('sections'):
+        summaries = summarize_jobs(jobs, llm, history, section_deadline)
+    
+    # Reduce step: the overall summary is written from the finished section summaries
+    if hierarchical:
+        totals = overall_summary.local_totals(sections, section_order)
+        reduce_input = overall_summary.build_reduce_input(summaries, totals, SECTION_TITLES)
+        if reduce_input:
+            if deadlines.expired(deadline):
+                overall = timed_out_result('overall_summary')
+            else:
+                with stage_timing.stage('overall'):
+                    overall = summarize_jobs({'overall_from_sections': reduce_input}, llm, history, deadline,
+                                             overall_summary.REDUCE_MAX_CHARS)['overall_from_sections']
+            summaries = {'overall_summary': overall, **summaries}
+    
+    if history is not None:
+        with stage_timing.stage('history'), HISTORY_LOCK:
+            summary_history.save_history(account, history)
+    
+    if statement_id is not None:
         try:
-            summary = summarize_section(section_name, content, bedrock_client)
-            summaries[section_name] = {
-                'summary': summary
-            }
+            with stage_timing.stage('store'):
+                statement_store.save_summaries(statement_id, summaries)
         except Exception as e:
-            summaries[section_name] = {
-                'summary': f"Error summarizing {section_name}: {e}"
-            }
+            print(f"Error saving summaries for search: {e}")
+    
+    # What boilerplate removal saved applies to the whole document
+    if sections.get('boilerplate'):
+        for data in summaries.values():
+            data['boilerplate'] = sections['boilerplate']
     
     return summaries
 
-def process_file(uploaded_file):
+def summarize_sections(pdf_path, section_names, llm, time_budget=None):
+    """
+    Summarize just the requested sections, reading only their pages.
+
+    Returns {section: {'summary', 'status', ..., 'pages_read'}} for the
+    sections that have content. Summary history and the statement store are
+    left alone, since they expect whole statements.
+    """
+    deadline = deadlines.make_deadline(time_budget)
+    with stage_timing.stage('extract'):
+        sections = extract_targeted_sections(pdf_path, section_names, deadline=deadline)
+    if 'error' in sections:
+        return sections
+
+    jobs = {name: sections[name] for name in section_names if len(str(sections.get(name, [])).strip()) >= 50}
+    with stage_timing.stage('sections'):
+        summaries = summarize_jobs(jobs, llm, None, deadline)
+    for data in summaries.values():
+        data['pages_read'] = sections['pages_read']
+    return summaries
+
+def process_file(uploaded_file, time_budget=None):
     """
     Main function to process uploaded files
     This function will be called by the Streamlit app
+
+    time_budget defaults to PROCESS_TIME_BUDGET seconds; sections that did not
+    finish in time come back with Status 'timed_out'.
     """
+    if time_budget is None:
+        time_budget = deadlines.DEFAULT_TIME_BUDGET
     
     if uploaded_file.type == "application/pdf":
         # Save uploaded file to temporary location
@@ -504,8 +640,12 @@ def process_file(uploaded_file):
             tmp_file_path = tmp_file.name
         
         try:
-            # Process the PDF and get summaries using Bedrock Llama
-            summaries = process_brokerage_statement(tmp_file_path, client)
+            # Process the PDF and get summaries from the configured LLM backend
+            summaries = process_brokerage_statement(tmp_file_path, get_backend(), source=uploaded_file.name,
+                                                    time_budget=time_budget)
+            
+            if 'error' in summaries:
+                return {"error": summaries['error']}
             
             # Format the output for display
             if summaries:
@@ -516,26 +656,20 @@ def process_file(uploaded_file):
                     formatted_output['overall_summary'] = {
                         'Section': 'Overall Summary',
                         'Summary': summaries['overall_summary']['summary'],
+                        'Status': summaries['overall_summary'].get('status', deadlines.COMPLETE),
+                        'Boilerplate': summaries['overall_summary'].get('boilerplate'),
                         'Priority': 0  # For ordering
                     }
                 
                 # Format section-wise summaries
-                section_titles = {
-                    'dividends': 'Dividends & Distributions',
-                    'transactions': 'Trading Activity',
-                    'positions': 'Portfolio Positions',
-                    'fees': 'Fees & Charges',
-                    'performance': 'Performance Metrics',
-                    'account_summary': 'Account Summary',
-                    'other': 'Other Information'
-                }
-                
                 priority = 1
                 for section_key, data in summaries.items():
                     if section_key != 'overall_summary':
                         formatted_output[section_key] = {
-                            'Section': section_titles.get(section_key, section_key.replace('_', ' ').title()),
+                            'Section': SECTION_TITLES.get(section_key, section_key.replace('_', ' ').title()),
                             'Summary': data['summary'],
+                            'Status': data.get('status', deadlines.COMPLETE),
+                            'Boilerplate': data.get('boilerplate'),
                             'Priority': priority
                         }
                         priority += 1
@@ -0,0 +1,271 @@
+import cProfile
+import csv
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+import stage_timing
+
+# Directory for profiles; set PIPELINE_PROFILE_DIR (or pass profile_dir) to profile every statement
+PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR", "")
+
+# Tools to run. cprofile and tracemalloc each slow extraction several times over, so for
+# realistic stage and page times use just "sampler"
+PROFILE_TOOLS = {tool.strip() for tool in os.getenv("PIPELINE_PROFILE_TOOLS", "sampler,cprofile,tracemalloc").split(",")}
+
+# Seconds between stack samples of the pipeline's threads
+SAMPLE_INTERVAL = float(os.getenv("PIPELINE_PROFILE_INTERVAL", "0.005"))
+
+# Allocation sites reported per stage, and stack depth tracemalloc keeps for each
+TOP_ALLOCATIONS = int(os.getenv("PIPELINE_PROFILE_TOP", "15"))
+TRACE_FRAMES = 8
+
+# Functions listed in the cProfile text report
+TOP_FUNCTIONS = 40
+
+# Slowest pages listed in summary.txt (pages.csv has them all)
+TOP_PAGES = 10
+
+# tracemalloc is process-wide: the first profiled run using it starts it and the last one stops it
+_tracing_runs = 0
+_started_tracing = False
+_tracing_lock = threading.Lock()
+
+
+def start_tracing():
+    global _tracing_runs, _started_tracing
+    with _tracing_lock:
+        if _tracing_runs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            _started_tracing = True
+        _tracing_runs += 1
+
+
+def stop_tracing():
+    global _tracing_runs, _started_tracing
+    with _tracing_lock:
+        _tracing_runs -= 1
+        if _tracing_runs == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def tracing_alone():
+    """True when no other profiled run is tracing allocations"""
+    with _tracing_lock:
+        return _tracing_runs <= 1
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stacks of the profiled thread and of the workers running its
+    jobs (summaries, OCR; see stage_timing.worker) every SAMPLE_INTERVAL
+    seconds. Other requests' threads are left out. Stacks are folded into
+    "stage;outer;...;inner" counts for flamegraph tools.
+    """
+
+    def __init__(self, target_ident):
+        super().__init__(daemon=True, name="pipeline-profiler")
+        self.target_ident = target_ident
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            # Stacks sampled in another thread are labelled with the pipeline's current stage
+            stage = stage_timing.active_stage(self.target_ident) or 'other'
+            threads = stage_timing.recording_threads(self.target_ident)
+            for ident, frame in sys._current_frames().items():
+                if ident not in threads:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join([stage] + labels[::-1])] += 1
+            self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class PipelineProfiler:
+    """
+    Stage listener (see stage_timing.record_stages) taking tracemalloc snapshots
+    around each stage. Snapshots cover the whole process, so while other profiled
+    runs overlap this one their allocations are counted too (noted in the report).
+    """
+
+    def __init__(self):
+        self.allocations = {}
+        self.peaks = {}
+        self.overlapped = False
+        self._before = {}
+
+    def snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+    def stage_started(self, name):
+        # Resetting the peak would clear another run's stage peak
+        if tracing_alone():
+            tracemalloc.reset_peak()
+        else:
+            self.overlapped = True
+        self._before[name] = (self.snapshot(), tracemalloc.get_traced_memory()[0])
+
+    def stage_finished(self, name, seconds):
+        if name not in self._before:
+            return
+        if not tracing_alone():
+            self.overlapped = True
+        before, current_before = self._before.pop(name)
+        peak = tracemalloc.get_traced_memory()[1] - current_before
+        self.peaks[name] = max(self.peaks.get(name, 0), peak)
+        stats = self.snapshot().compare_to(before, 'traceback')
+        self.allocations.setdefault(name, []).extend(stats[:TOP_ALLOCATIONS])
+
+
+def profile_path(directory, label):
+    """New run directory named after the time and the statement"""
+    safe_label = re.sub(r'[^A-Za-z0-9._-]+', '_', label or 'statement')[:60]
+    return os.path.join(directory, f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{safe_label}")
+
+
+def write_function_stats(profile, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for sort in ('cumulative', 'tottime'):
+            f.write(f"Top {TOP_FUNCTIONS} functions by {sort} time (profiled thread only)\n")
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats(sort).print_stats(TOP_FUNCTIONS)
+            f.write(stream.getvalue() + "\n")
+
+
+def write_allocations(profiler, path):
+    with open(path, "w", encoding="utf-8") as f:
+        if profiler.overlapped:
+            f.write("Other profiled runs overlapped this one: their allocations are included "
+                    "and peaks are process-wide\n\n")
+        for name, stats in profiler.allocations.items():
+            f.write(f"== {name}: peak {profiler.peaks.get(name, 0) / 1024 / 1024:.1f} MB traced ==\n")
+            for stat in sorted(stats, key=lambda stat: stat.size_diff, reverse=True)[:TOP_ALLOCATIONS]:
+                f.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                        f"(now {stat.size / 1024:.1f} KiB)\n")
+                for line in stat.traceback.format(most_recent_first=True)[:TRACE_FRAMES * 2]:
+                    f.write(f"    {line}\n")
+            f.write("\n")
+
+
+def write_pages(pages, path):
+    fields = ['page', 'seconds', 'cpu_seconds', 'tables', 'table_rows', 'chars']
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for page in pages:
+            writer.writerow({key: round(value, 6) if isinstance(value, float) else value
+                             for key, value in page.items()})
+
+
+def write_summary(path, label, elapsed, timings, pages, tools, samples):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{label}: {elapsed:.3f}s with {', '.join(sorted(tools))}, {samples} stack samples\n\nStages\n")
+        for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+            f.write(f"  {name:<10} {seconds:8.3f}s  {seconds / elapsed if elapsed else 0:6.1%}\n")
+
+        f.write(f"\nSlowest pages ({len(pages)} read)\n")
+        for page in sorted(pages, key=lambda page: page['seconds'], reverse=True)[:TOP_PAGES]:
+            f.write(f"  page {page['page']:<4} {page['seconds']:7.3f}s  cpu {page['cpu_seconds']:7.3f}s  "
+                    f"{page['tables']} tables / {page['table_rows']} rows  {page['chars']} chars\n")
+
+
+@contextmanager
+def profile_pipeline(label, profile_dir=None):
+    """
+    Profile the pipeline run inside the block when profiling is enabled
+    (profile_dir or PIPELINE_PROFILE_DIR); otherwise do nothing.
+
+    Writes to a new directory under the profile directory:
+      summary.txt      stage times and the slowest pages
+      pages.csv        extraction time, CPU time, tables and characters per page
+      stacks.folded    (sampler) sampled stacks of all pipeline threads, prefixed
+                       with the stage (flamegraph.pl, speedscope, inferno)
+      functions.prof   (cprofile) data for the calling thread (pstats, snakeviz)
+      functions.txt    (cprofile) the same, as text
+      allocations.txt  (tracemalloc) top allocation sites per stage
+    """
+    directory = profile_dir or PROFILE_DIR
+    if not directory:
+        yield None
+        return
+
+    out_dir = profile_path(directory, label)
+    os.makedirs(out_dir, exist_ok=True)
+    tools = set(PROFILE_TOOLS)
+
+    profiler = None
+    if 'tracemalloc' in tools:
+        profiler = PipelineProfiler()
+        start_tracing()
+
+    sampler = None
+    if 'sampler' in tools:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+
+    function_profile = None
+    if 'cprofile' in tools:
+        function_profile = cProfile.Profile()
+        try:
+            function_profile.enable()
+        except ValueError:
+            # Another profiler is already attached to this thread
+            function_profile = None
+            tools.discard('cprofile')
+
+    start = time.perf_counter()
+    try:
+        with stage_timing.record_stages(listener=profiler) as timings, stage_timing.record_pages() as pages:
+            yield out_dir
+    finally:
+        elapsed = time.perf_counter() - start
+        if function_profile:
+            function_profile.disable()
+        if sampler:
+            sampler.stop()
+        if profiler:
+            stop_tracing()
+
+        try:
+            if sampler:
+                with open(os.path.join(out_dir, "stacks.folded"), "w", encoding="utf-8") as f:
+                    for stack, count in sampler.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            if function_profile:
+                function_profile.dump_stats(os.path.join(out_dir, "functions.prof"))
+                write_function_stats(function_profile, os.path.join(out_dir, "functions.txt"))
+            if profiler:
+                write_allocations(profiler, os.path.join(out_dir, "allocations.txt"))
+            write_pages(pages, os.path.join(out_dir, "pages.csv"))
+            write_summary(os.path.join(out_dir, "summary.txt"), label, elapsed, timings, pages, tools,
+                          sampler.samples if sampler else 0)
+            print(f"Profile written to {out_dir}")
+        except Exception as e:
+            print(f"Error writing profile: {e}")
@@ -0,0 +1,13 @@
+# Statement sections, in the order they are summarized and shown. Kept apart from
+# processor.py so the app can label sections without importing the pipeline.
+SECTION_NAMES = ['dividends', 'transactions', 'positions', 'fees', 'performance', 'account_summary', 'other']
+
+SECTION_TITLES = {
+    'dividends': 'Dividends & Distributions',
+    'transactions': 'Trading Activity',
+    'positions': 'Portfolio Positions',
+    'fees': 'Fees & Charges',
+    'performance': 'Performance Metrics',
+    'account_summary': 'Account Summary',
+    'other': 'Other Information'
+}
@@ -0,0 +1,156 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+# Stage each recording thread is in, so profilers sampling other threads can label their stacks
+_active = {}
+
+# Worker threads currently running jobs submitted by each recording thread (see worker())
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+@contextmanager
+def record_stages(listener=None):
+    """
+    Collect the time spent in each stage() entered by this thread.
+
+        with record_stages() as timings:
+            process_file(upload)
+        timings  # {'extract': 1.2, 'sections': 3.4, ...}
+
+    listener, if given, has stage_started(name) and stage_finished(name, seconds)
+    called around every stage (see profiling.py).
+    """
+    previous = getattr(_local, 'timings', None), getattr(_local, 'listener', None), getattr(_local, 'owner', None)
+    _local.timings = timings = {}
+    _local.listener = listener
+    _local.owner = previous[2] or threading.get_ident()
+    try:
+        yield timings
+    finally:
+        _local.timings, _local.listener, _local.owner = previous
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage; only recorded inside record_stages() on the same thread"""
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        yield
+        return
+
+    listener = _local.listener
+    ident = threading.get_ident()
+    _active[ident] = name
+    if listener:
+        notify(listener.stage_started, name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[name] = timings.get(name, 0.0) + elapsed
+        _active.pop(ident, None)
+        if listener:
+            notify(listener.stage_finished, name, elapsed)
+
+
+def notify(callback, *args):
+    """Call a listener method; a failing listener (a profiler) must not fail the stage"""
+    try:
+        callback(*args)
+    except Exception as e:
+        print(f"Error in stage listener: {e}")
+
+
+def active_stage(ident):
+    """Stage the thread with this ident is in (None outside recorded stages)"""
+    return _active.get(ident)
+
+
+def worker(fn):
+    """
+    Wrap fn before handing it to a thread pool, so the thread running it counts
+    as working for the calling thread's recording (see recording_threads).
+    Outside record_stages() fn is returned unchanged.
+    """
+    owner = getattr(_local, 'owner', None)
+    if owner is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        previous = getattr(_local, 'owner', None)
+        _local.owner = owner
+        with _workers_lock:
+            _workers.setdefault(owner, set()).add(ident)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.owner = previous
+            with _workers_lock:
+                threads = _workers.get(owner, set())
+                threads.discard(ident)
+                if not threads:
+                    _workers.pop(owner, None)
+
+    return run
+
+
+def recording_threads(ident):
+    """The recording thread with this ident and the workers currently running its jobs"""
+    with _workers_lock:
+        return {ident} | _workers.get(ident, set())
+
+
+@contextmanager
+def record_pages():
+    """Collect a cost entry per page read through timed_pages() on this thread"""
+    previous = getattr(_local, 'pages', None)
+    _local.pages = pages = []
+    try:
+        yield pages
+    finally:
+        _local.pages = previous
+
+
+def page_chars(content):
+    """Characters of a page's text (a string, or template (section, line) pairs)"""
+    if isinstance(content, str):
+        return len(content)
+    return sum(len(line) for _, line in content or [])
+
+
+def timed_pages(page_iter):
+    """
+    Pass (page_num, tables, content) pages through, recording how long each
+    took to read when inside record_pages(). Engines extract lazily, so this
+    is the page's extraction cost.
+    """
+    pages = getattr(_local, 'pages', None)
+    if pages is None:
+        yield from page_iter
+        return
+
+    page_iter = iter(page_iter)
+    while True:
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            page = next(page_iter)
+        except StopIteration:
+            return
+        page_num, tables, content = page
+        pages.append({
+            'page': page_num + 1,
+            'seconds': time.perf_counter() - start,
+            'cpu_seconds': time.thread_time() - cpu_start,
+            'tables': len(tables),
+            'table_rows': sum(len(table) for table in tables),
+            'chars': page_chars(content),
+        })
+        yield page
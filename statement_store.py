@@ -0,0 +1,550 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import date, datetime, timezone
+
+# SQLite file holding the data extracted from every processed statement; set to "" to disable
+DB_PATH = os.getenv("STATEMENT_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "statements.db"))
+
+# Longer items (paragraphs of disclosure text) are stored as text only
+MAX_RECORD_CHARS = 300
+
+MONTHS = {name: i + 1 for i, name in enumerate(
+    ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+     'august', 'september', 'october', 'november', 'december'])}
+MONTH_RE = r'(January|February|March|April|May|June|July|August|September|October|November|December)'
+DASH_RE = r'\s*(?:-|–|—|to|through)\s*'
+
+# Statement periods, as printed by different brokers:
+#   "July 1 – July 31, 2015", "JUNE 1–30, 2018", "01-Jan-2024 to 31-Jan-2024", "06/01/2018 - 06/30/2018"
+PERIOD_LONG_RE = re.compile(MONTH_RE + r'\s+(\d{1,2})(?:,\s*(\d{4}))?' + DASH_RE + MONTH_RE + r'?\s*(\d{1,2}),\s*(\d{4})', re.IGNORECASE)
+PERIOD_SHORT_RE = re.compile(r'(\d{1,2})-([A-Za-z]{3})-(\d{4})' + DASH_RE + r'(\d{1,2})-([A-Za-z]{3})-(\d{4})')
+PERIOD_NUMERIC_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})' + DASH_RE + r'(\d{1,2})/(\d{1,2})/(\d{4})')
+AS_OF_RE = re.compile(r'as of (\d{1,2})/(\d{1,2})/(\d{4})', re.IGNORECASE)
+
+# Fields read from a single line or table row
+# Amounts: "$1,234", "-$7.95", "(895.65)", or bare numbers with cents
+AMOUNT_RE = re.compile(r'(?<![\w.,])\(?[-−+]?(?:\$[-−]?\d[\d,]*(?:\.\d{2})?|\d{1,3}(?:,\d{3})*\.\d{2})(?![\d.])\)?')
+LINE_DATE_RE = re.compile(r'(?<![\d/])(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?(?![\d/])')
+LINE_DATE_LONG_RE = re.compile(r'\b(\d{1,2})-([A-Za-z]{3})-(\d{4})\b')
+# A date right after another date or a range dash belongs to the same record ("06/10/18 06/13/18 Dividend")
+DATE_CONTINUES_RE = re.compile(r'(?:\d{1,2}/\d{1,2}(?:/\d{2,4})?|[-–—]|\bto|\bthrough)\s*$')
+SYMBOL_RES = [
+    re.compile(r'\(([A-Z]{1,5}(?:\.[A-Z])?)\)'),                       # "Apple Inc (AAPL)"
+    re.compile(r'(?<![\d/])\d{1,2}/\d{1,2}\s+([A-Z]{2,5})\b'),            # "7/01 DBLTX Dividend received"
+    re.compile(r'\b([A-Z]{2,5})\s+(?:You bought|You sold|Dividend|Reinvestment|Return of capital)'),
+    re.compile(r'\b(?:Buy|Sell|Bought|Sold)\s+([A-Z]{1,5})\b'),                # "Buy AAPL -$5000"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    content_hash TEXT UNIQUE,
+    template TEXT,
+    period_start TEXT,
+    period_end TEXT,
+    accounts TEXT,
+    processed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    statement_id INTEGER NOT NULL REFERENCES statements(id) ON DELETE CASCADE,
+    account TEXT,
+    statement_date TEXT,
+    section TEXT,
+    page INTEGER,
+    kind TEXT,
+    symbol TEXT,
+    trade_date TEXT,
+    description TEXT,
+    amount REAL,
+    amounts TEXT,
+    text TEXT,
+    cells TEXT,
+    header TEXT
+);
+CREATE INDEX IF NOT EXISTS records_account_date ON records(account, statement_date);
+CREATE INDEX IF NOT EXISTS records_symbol ON records(symbol, statement_date);
+CREATE INDEX IF NOT EXISTS records_section_date ON records(section, statement_date);
+CREATE INDEX IF NOT EXISTS records_statement ON records(statement_id);
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY,
+    statement_id INTEGER NOT NULL REFERENCES statements(id) ON DELETE CASCADE,
+    section TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS summaries_statement ON summaries(statement_id);
+"""
+
+# Full-text search over record lines and summaries. The FTS5 tables index the
+# text stored in records/summaries; triggers keep them in step with every
+# insert and delete, including rows removed when a statement is replaced.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(text, content='records', content_rowid='id');
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(summary, content='summaries', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS records_fts_insert AFTER INSERT ON records BEGIN
+    INSERT INTO records_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS records_fts_delete AFTER DELETE ON records BEGIN
+    INSERT INTO records_fts(records_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_fts_insert AFTER INSERT ON summaries BEGIN
+    INSERT INTO summaries_fts(rowid, summary) VALUES (new.id, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS summaries_fts_delete AFTER DELETE ON summaries BEGIN
+    INSERT INTO summaries_fts(summaries_fts, rowid, summary) VALUES ('delete', old.id, old.summary);
+END;
+"""
+
+# Markers around matched terms in search snippets
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_TOKENS = 16
+
+SEARCH_TOKEN_RE = re.compile(r'\w+')
+
+# Store files whose schema was created or checked by this process; the setup runs once per path
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def store_enabled():
+    return bool(DB_PATH)
+
+
+def connect(path=None):
+    """Open the store, creating the schema the first time this process opens the path"""
+    path = DB_PATH if path is None else path
+    # An in-memory database, or a file deleted since, starts empty again
+    if path == ':memory:' or not os.path.exists(path):
+        _schema_ready.discard(path)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys=ON")
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                ensure_columns(conn)
+                ensure_search_schema(conn)
+                _schema_ready.add(path)
+    return conn
+
+
+# Columns added to records after the first release: (name, type)
+ADDED_RECORD_COLUMNS = [('cells', 'TEXT'), ('header', 'TEXT')]
+
+
+def ensure_columns(conn):
+    """Add columns missing from a store created by an older version"""
+    existing = {row['name'] for row in conn.execute("PRAGMA table_info(records)")}
+    for name, column_type in ADDED_RECORD_COLUMNS:
+        if name not in existing:
+            try:
+                conn.execute(f"ALTER TABLE records ADD COLUMN {name} {column_type}")
+            except sqlite3.OperationalError:
+                # Another connection added it first
+                pass
+
+
+def ensure_search_schema(conn):
+    """Create the full-text index, filling it from existing rows the first time"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'records_fts'").fetchone()
+    try:
+        conn.executescript(SEARCH_SCHEMA)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5 - the store works, search does not
+        print(f"Full-text search unavailable: {e}")
+        return
+    if not exists:
+        with conn:
+            conn.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO summaries_fts(summaries_fts) VALUES ('rebuild')")
+
+
+def iso_date(year, month, day):
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def month_number(name):
+    name = name.lower()
+    return next((number for month, number in MONTHS.items() if month.startswith(name)), None)
+
+
+def statement_period(text):
+    """Return (start, end) ISO dates of the statement period, or (None, None)"""
+    match = PERIOD_LONG_RE.search(text)
+    if match:
+        month1, day1, year1, month2, day2, year2 = match.groups()
+        end = iso_date(year2, month_number(month2 or month1), day2)
+        return iso_date(year1 or year2, month_number(month1), day1), end
+
+    match = PERIOD_SHORT_RE.search(text)
+    if match:
+        day1, month1, year1, day2, month2, year2 = match.groups()
+        return iso_date(year1, month_number(month1), day1), iso_date(year2, month_number(month2), day2)
+
+    match = PERIOD_NUMERIC_RE.search(text)
+    if match:
+        month1, day1, year1, month2, day2, year2 = match.groups()
+        return iso_date(year1, month1, day1), iso_date(year2, month2, day2)
+
+    match = AS_OF_RE.search(text)
+    if match:
+        month, day, year = match.groups()
+        return None, iso_date(year, month, day)
+
+    return None, None
+
+
+def parse_amount(text):
+    """Convert "$1,234.56", "-$7.95", "−44.37" or "(895.65)" to a float"""
+    negative = '-' in text or '−' in text or (text.startswith('(') and text.endswith(')'))
+    value = float(re.sub(r'[^\d.]', '', text))
+    return -value if negative else value
+
+
+def line_date(text, period_end):
+    """ISO date of the first m/d[/y] or dd-Mon-yyyy on a line; the year comes from the period when missing"""
+    match = LINE_DATE_LONG_RE.search(text)
+    if match:
+        day, month, year = match.groups()
+        return iso_date(year, month_number(month), day)
+
+    match = LINE_DATE_RE.search(text)
+    if not match or not period_end:
+        return None
+
+    month, day, year = match.groups()
+    end = date.fromisoformat(period_end)
+    if year:
+        year = int(year) + (2000 if len(year) == 2 else 0)
+    else:
+        year = end.year if int(month) <= end.month else end.year - 1
+    return iso_date(year, month, day)
+
+
+def line_symbol(text):
+    for pattern in SYMBOL_RES:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+def parse_record(text, period_end):
+    """Pull symbol, date and amounts out of one line or table row"""
+    if len(text) > MAX_RECORD_CHARS:
+        return {'symbol': None, 'trade_date': None, 'description': None, 'amount': None, 'amounts': None}
+
+    amounts = [parse_amount(match) for match in AMOUNT_RE.findall(text)]
+    description = AMOUNT_RE.sub('', text)
+    description = LINE_DATE_LONG_RE.sub('', LINE_DATE_RE.sub('', description))
+    description = ' '.join(description.split()) or None
+
+    return {
+        'symbol': line_symbol(text),
+        'trade_date': line_date(text, period_end),
+        'description': description,
+        'amount': amounts[0] if amounts else None,
+        'amounts': json.dumps(amounts) if amounts else None,
+    }
+
+
+def record_lines(text):
+    """
+    Split a line holding several transactions at each date that starts one.
+    Generic extraction runs a statement's columns together, so one line can
+    read "06/10/18 06/10/18 Div ... 3.21 06/10/18 06/10/18 Bond Interest ...".
+    """
+    starts = [match.start() for match in LINE_DATE_RE.finditer(text)
+              if not DATE_CONTINUES_RE.search(text[max(0, match.start() - 16):match.start()])]
+    # Text before the first date (a security name) belongs to the first transaction
+    starts = starts[1:]
+    if not starts:
+        return [text]
+    bounds = [0] + starts + [len(text)]
+    return [piece for piece in (text[start:end].strip() for start, end in zip(bounds, bounds[1:])) if piece]
+
+
+def page_account_map(page_accounts, statement_accounts):
+    """
+    Resolve the account of every page: pages showing one account number
+    belong to it, later pages without one inherit the last account seen.
+    """
+    resolved = {}
+    current = statement_accounts[0] if len(statement_accounts) == 1 else None
+    for page_num in sorted(page_accounts):
+        numbers = set(page_accounts[page_num])
+        if len(numbers) == 1:
+            current = numbers.pop()
+            resolved[page_num] = current
+        else:
+            # Several accounts on one page (a household overview) - none is "the" account
+            resolved[page_num] = current if not numbers else None
+    return resolved
+
+
+def section_items(sections, section_name):
+    """
+    Yield (page, kind, text, symbol, cells, header) for every line and table
+    row of a section. Table rows also keep their cells and the table's header
+    row; both are None for lines.
+    """
+    items = sections.get(section_name, [])
+    pages = sections.get('item_pages', {}).get(section_name, [None] * len(items))
+
+    for item, page_num in zip(items, pages):
+        if isinstance(item, list):  # A table: the header row names the symbol column
+            header = [str(cell) if cell else '' for cell in item[0]]
+            symbol_column = next((i for i, cell in enumerate(header) if 'symbol' in cell.lower()), None)
+            for row in item[1:]:
+                cells = [str(cell) if cell else '' for cell in row]
+                text = ' '.join(cell for cell in cells if cell)
+                symbol = None
+                if symbol_column is not None and symbol_column < len(cells) and cells[symbol_column]:
+                    symbol = cells[symbol_column].split()[0]
+                if text:
+                    yield page_num, 'row', text, symbol, cells, header
+        elif item:
+            for line in record_lines(str(item)):
+                yield page_num, 'line', line, None, None, None
+
+
+def save_statement(sections, source=None, section_names=None, path=None, file_hash=None):
+    """
+    Write a statement's extracted sections to the store and return its id.
+    Storing the same statement again replaces its earlier records.
+
+    file_hash (a digest of the PDF bytes) identifies the statement. Without
+    it the extracted text is hashed instead, which changes whenever
+    extraction does (boilerplate index, engine, templates).
+    """
+    overall_text = sections.get('overall_text', '')
+    section_names = section_names or [name for name, value in sections.items() if isinstance(value, list)]
+
+    page_accounts = sections.get('page_accounts', {})
+    statement_accounts = sorted({number for numbers in page_accounts.values() for number in numbers})
+    accounts = page_account_map(page_accounts, statement_accounts)
+    period_start, period_end = statement_period(overall_text)
+    digest = file_hash or hashlib.sha256(overall_text.encode("utf-8")).hexdigest()
+
+    rows = []
+    for section_name in section_names:
+        for page_num, kind, text, symbol, cells, header in section_items(sections, section_name):
+            fields = parse_record(text, period_end)
+            account = accounts.get(page_num)
+            if account is None and len(statement_accounts) == 1:
+                account = statement_accounts[0]
+            rows.append((
+                account, period_end, section_name, page_num, kind,
+                symbol or fields['symbol'], fields['trade_date'], fields['description'],
+                fields['amount'], fields['amounts'], text,
+                json.dumps(cells) if cells is not None else None,
+                json.dumps(header) if header is not None else None,
+            ))
+
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute("DELETE FROM statements WHERE content_hash = ?", (digest,))
+            cursor = conn.execute(
+                "INSERT INTO statements (source, content_hash, template, period_start, period_end, accounts, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, digest, sections.get('template'), period_start, period_end,
+                 json.dumps(statement_accounts), datetime.now(timezone.utc).isoformat())
+            )
+            statement_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO records (statement_id, account, statement_date, section, page, kind, symbol, "
+                "trade_date, description, amount, amounts, text, cells, header) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(statement_id,) + row for row in rows]
+            )
+    return statement_id
+
+
+def save_summaries(statement_id, summaries, path=None):
+    """Store a statement's generated summaries ({section: {'summary': ...}}) for search"""
+    rows = [
+        (statement_id, section_name, data['summary'])
+        for section_name, data in summaries.items()
+        if data.get('summary') and data.get('status', 'complete') == 'complete'
+        and not data['summary'].startswith(("Error", "No meaningful", "No response"))
+    ]
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute("DELETE FROM summaries WHERE statement_id = ?", (statement_id,))
+            # A concurrent upload of the same statement may have replaced it meanwhile;
+            # that upload stores its own summaries, so these are dropped
+            if conn.execute("SELECT 1 FROM statements WHERE id = ?", (statement_id,)).fetchone() is None:
+                return
+            conn.executemany("INSERT INTO summaries (statement_id, section, summary) VALUES (?, ?, ?)", rows)
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    as a prefix so results appear while a symbol is still being typed.
+    Quotes and operators in the input are treated as plain text.
+    """
+    terms = []
+    for chunk in text.split():
+        # "111-111111" or "$44.37" must match as a phrase, not as separate words
+        tokens = SEARCH_TOKEN_RE.findall(chunk)
+        if tokens:
+            terms.append('"' + ' '.join(tokens) + '"')
+    if not terms:
+        return None
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def top_matches(conn, fts_table, content_table, expression, limit, filters, params):
+    """
+    Return (rowid, rank) of the best matches in one FTS table. Only the
+    ranking touches the index; rows are joined for the filters, with the
+    FTS table kept as the outer loop.
+    """
+    if not filters:
+        sql = f"SELECT rowid, rank FROM {fts_table} WHERE {fts_table} MATCH ? ORDER BY rank LIMIT ?"
+    else:
+        sql = (f"SELECT f.rowid, f.rank FROM {fts_table} f CROSS JOIN {content_table} c ON c.id = f.rowid "
+               f"WHERE {fts_table} MATCH ?{filters} ORDER BY f.rank LIMIT ?")
+    return conn.execute(sql, [expression] + params + [limit]).fetchall()
+
+
+def search(text, limit=50, section=None, account=None, path=None):
+    """
+    Ranked full-text search over stored lines, table rows and summaries.
+
+    Returns dicts with source, statement_date, account, section, page, kind
+    ('line', 'row' or 'summary'), rank and a snippet whose matches are
+    wrapped in SNIPPET_START/SNIPPET_END. Summaries have no single account,
+    so they are left out when filtering by account.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return []
+
+    filters, params = "", []
+    if section is not None:
+        filters += " AND c.section = ?"
+        params.append(section)
+    if account is not None:
+        filters += " AND c.account = ?"
+        params.append(account)
+
+    snippet = f"snippet({{table}}, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', {SNIPPET_TOKENS})"
+    details = {
+        'records_fts': f"""
+            SELECT records_fts.rowid AS id, r.statement_id, s.source, r.statement_date, r.account, r.section,
+                   r.page, r.kind, {snippet.format(table='records_fts')} AS snippet
+            FROM records_fts JOIN records r ON r.id = records_fts.rowid JOIN statements s ON s.id = r.statement_id
+            WHERE records_fts MATCH ? AND records_fts.rowid IN ({{ids}})""",
+        'summaries_fts': f"""
+            SELECT summaries_fts.rowid AS id, m.statement_id, s.source, s.period_end AS statement_date,
+                   NULL AS account, m.section, NULL AS page, 'summary' AS kind,
+                   {snippet.format(table='summaries_fts')} AS snippet
+            FROM summaries_fts JOIN summaries m ON m.id = summaries_fts.rowid JOIN statements s ON s.id = m.statement_id
+            WHERE summaries_fts MATCH ? AND summaries_fts.rowid IN ({{ids}})""",
+    }
+    sources = [('records_fts', 'records')]
+    if account is None:
+        sources.append(('summaries_fts', 'summaries'))
+
+    results = []
+    try:
+        with closing(connect(path)) as conn:
+            for fts_table, content_table in sources:
+                ranks = dict(top_matches(conn, fts_table, content_table, expression, limit, filters, params))
+                if not ranks:
+                    continue
+                # Snippets are only built for the rows that made the cut
+                sql = details[fts_table].format(ids=', '.join('?' * len(ranks)))
+                for row in conn.execute(sql, [expression] + list(ranks)):
+                    result = dict(row)
+                    result['rank'] = ranks[result.pop('id')]
+                    results.append(result)
+    except sqlite3.OperationalError as e:
+        print(f"Error searching statements: {e}")
+        return []
+
+    results.sort(key=lambda result: result['rank'])
+    return results[:limit]
+
+
+def record_filters(account=None, section=None, symbol=None, start=None, end=None, description=None):
+    """Build a WHERE clause for the record query helpers"""
+    clauses, params = [], []
+    for column, value in (('account', account), ('section', section), ('symbol', symbol)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if start is not None:
+        clauses.append("statement_date >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("statement_date <= ?")
+        params.append(end)
+    if description is not None:
+        clauses.append("description LIKE ?")
+        params.append(description)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query(sql, params=(), path=None):
+    """Run a read-only SQL query against the store and return rows as dicts"""
+    with closing(connect(path)) as conn:
+        return [dict(row) for row in conn.execute(sql, params)]
+
+
+def iter_query(sql, params=(), batch_size=1000, path=None):
+    """Like query(), but yield rows as they are fetched, batch_size at a time"""
+    with closing(connect(path)) as conn:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+
+
+def find_records(account=None, section=None, symbol=None, start=None, end=None, description=None,
+                 limit=1000, path=None):
+    """
+    Return stored lines/rows matching the filters. start and end bound the
+    statement date (ISO strings); description is a SQL LIKE pattern.
+    """
+    where, params = record_filters(account, section, symbol, start, end, description)
+    return query(f"SELECT * FROM records{where} ORDER BY statement_date, statement_id, id LIMIT ?",
+                 params + [limit], path)
+
+
+def total_amount(section, account=None, symbol=None, start=None, end=None, description=None, path=None):
+    """
+    Sum the first amount of matching records, e.g.
+    total_amount('dividends', description='Total%', start='2015-07-01', end='2015-09-30')
+    """
+    where, params = record_filters(account, section, symbol, start, end, description)
+    rows = query(f"SELECT SUM(amount) AS total FROM records{where}", params, path)
+    return rows[0]['total'] or 0.0
+
+
+def list_statements(account=None, path=None):
+    """Return the stored statements, newest period first"""
+    sql = "SELECT * FROM statements"
+    params = []
+    if account is not None:
+        sql += " WHERE id IN (SELECT statement_id FROM records WHERE account = ?)"
+        params.append(account)
+    return query(sql + " ORDER BY period_end DESC", params, path)
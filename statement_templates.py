@@ -0,0 +1,244 @@
+import pdfplumber
+
+from extraction_engines import ocr_available, ocr_scanned_pages
+
+# PyMuPDF is optional - without it every statement takes the generic path
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# How far (in points) page sizes and header anchors may drift and still match
+PAGE_SIZE_TOLERANCE = 2
+ANCHOR_TOLERANCE = 15
+
+# Lines whose tops are this close are treated as one row of text
+ROW_TOLERANCE = 2
+
+# Known statement layouts, keyed by template name.
+#
+#   issuer           text that must appear on the first page
+#   page_size        (width, height) of the first page
+#   anchors          (text, x, y) header positions on the first page
+#   body_box         crop box for text on template-sized pages (drops running headers/footers)
+#   title_box        region holding the page title; its heading sets the page's default section
+#   columns          x boundaries of the text columns headings apply to
+#   heading_min_size font size from which a line counts as a heading
+#   default_section  section for pages without a title
+#   section_map      (heading prefix, section) pairs, first match wins
+#   table_settings   pdfplumber table settings, or None when the layout has no ruled tables
+#   table_boxes      crop boxes handed to pdfplumber when table_settings is set
+STATEMENT_TEMPLATES = {
+    'fidelity_investment_report': {
+        'issuer': 'Fidelity',
+        'page_size': (756, 612),
+        'anchors': [('INVESTMENT REPORT', 629, 45)],
+        'body_box': (0, 70, 756, 575),
+        'title_box': (0, 90, 380, 120),
+        'columns': [0, 380, 756],
+        'heading_min_size': 10.5,
+        'default_section': 'account_summary',
+        'section_map': [
+            ('portfolio summary', 'account_summary'),
+            ('account summary', 'account_summary'),
+            ('accounts included', 'account_summary'),
+            ('core account cash flow', 'account_summary'),
+            ('college investment', 'account_summary'),
+            ('contribution elections', 'account_summary'),
+            ('income summary', 'dividends'),
+            ('dividends', 'dividends'),
+            ('realized gains', 'performance'),
+            ('change in account value', 'performance'),
+            ('fees and charges', 'fees'),
+            ('holdings', 'positions'),
+            ('account holdings', 'positions'),
+            ('top holdings', 'positions'),
+            ('asset allocation', 'positions'),
+            ('activity', 'transactions'),
+            ('securities bought', 'transactions'),
+            ('trades pending', 'transactions'),
+            ('securities transferred', 'transactions'),
+            ('estimated cash flow', 'other'),
+            ('contact information', 'other'),
+            ('minimum required distribution', 'other'),
+        ],
+        'table_settings': None,
+        'table_boxes': [],
+    },
+}
+
+
+def register_template(name, template):
+    """Add or replace a statement template in the registry"""
+    STATEMENT_TEMPLATES[name] = template
+
+
+def anchor_matches(page, text, x, y):
+    """Check that text appears on the page near (x, y)"""
+    for rect in page.search_for(text):
+        if abs(rect.x0 - x) <= ANCHOR_TOLERANCE and abs(rect.y0 - y) <= ANCHOR_TOLERANCE:
+            return True
+    return False
+
+
+def template_matches(page, page_text, template):
+    """Check a first page against one template's fingerprint"""
+    width, height = template['page_size']
+    if abs(page.rect.width - width) > PAGE_SIZE_TOLERANCE or abs(page.rect.height - height) > PAGE_SIZE_TOLERANCE:
+        return False
+
+    if template['issuer'].lower() not in page_text:
+        return False
+
+    return all(anchor_matches(page, text, x, y) for text, x, y in template['anchors'])
+
+
+def match_template(pdf_path):
+    """Return the name of the template matching the statement's first page, or None"""
+    if fitz is None:
+        return None
+
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"Error fingerprinting statement: {e}")
+        return None
+
+    try:
+        if len(doc) == 0:
+            return None
+
+        first_page = doc.load_page(0)
+        page_text = first_page.get_text("text").lower()
+
+        for name, template in STATEMENT_TEMPLATES.items():
+            if template_matches(first_page, page_text, template):
+                return name
+    finally:
+        doc.close()
+
+    return None
+
+
+def heading_section(heading, template, fallback):
+    """Map a heading to a section using the template's section map"""
+    heading = heading.lower()
+    for prefix, section in template['section_map']:
+        if heading.startswith(prefix):
+            return section
+    return fallback
+
+
+def column_index(x, columns):
+    """Return the index of the column containing x"""
+    for i in range(len(columns) - 1):
+        if x < columns[i + 1]:
+            return i
+    return len(columns) - 2
+
+
+def read_page_lines(page, clip):
+    """Return (x0, top, size, text) for every text line inside clip"""
+    lines = []
+    for block in page.get_text("dict", clip=clip)["blocks"]:
+        if block["type"] != 0:
+            continue
+        for line in block["lines"]:
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if text:
+                size = max(span["size"] for span in line["spans"])
+                lines.append((line["bbox"][0], line["bbox"][1], size, text))
+    return lines
+
+
+def page_section_lines(page, template):
+    """
+    Split a template page into (section, line) pairs.
+
+    Each line belongs to the nearest heading above it in the same column;
+    lines above any heading fall back to the page title's section.
+    """
+    width, height = template['page_size']
+    if abs(page.rect.width - width) > PAGE_SIZE_TOLERANCE or abs(page.rect.height - height) > PAGE_SIZE_TOLERANCE:
+        # Off-template pages (disclosures, endnotes) are kept as plain text
+        return [('other', line) for line in page.get_text("text").split('\n') if line.strip()]
+
+    lines = read_page_lines(page, fitz.Rect(template['body_box']))
+    title_box = fitz.Rect(template['title_box'])
+    columns = template['columns']
+
+    page_section = template['default_section']
+    headings = []  # (column, top, section)
+    body = []
+
+    for x0, top, size, text in lines:
+        if size < template['heading_min_size']:
+            body.append((column_index(x0, columns), top, x0, text))
+            continue
+
+        if title_box.contains(fitz.Point(x0, top)):
+            page_section = heading_section(text, template, page_section)
+        else:
+            headings.append((column_index(x0, columns), top, heading_section(text, template, None)))
+        body.append((column_index(x0, columns), top, x0, text))
+
+    body.sort()
+
+    # Merge lines on the same row of a column so label and amounts stay together
+    rows = []
+    for column, top, x0, text in body:
+        if rows and rows[-1][0] == column and abs(rows[-1][1] - top) <= ROW_TOLERANCE:
+            rows[-1][2].append(text)
+        else:
+            rows.append((column, top, [text]))
+
+    section_lines = []
+    for column, top, texts in rows:
+        section = page_section
+        nearest = None
+        for h_column, h_top, h_section in headings:
+            if h_column == column and h_top <= top + ROW_TOLERANCE and (nearest is None or h_top > nearest):
+                nearest = h_top
+                section = h_section or page_section
+        section_lines.append((section, ' '.join(texts)))
+
+    return section_lines
+
+
+def iter_template_pages(pdf_path, template_name, pages=None):
+    """
+    Yield (page_num, tables, section_lines) for a statement with a known template
+    (only the 0-based pages given, if any). Scanned pages are OCR'd when OCR is
+    available; their lines go to 'other'.
+    """
+    page_iter = read_template_pages(pdf_path, template_name, pages)
+    if not ocr_available():
+        return page_iter
+    return ocr_scanned_pages(
+        pdf_path, page_iter,
+        page_text=lambda section_lines: ' '.join(line for _, line in section_lines),
+        from_ocr=lambda text: [('other', line) for line in text.split('\n') if line.strip()]
+    )
+
+
+def read_template_pages(pdf_path, template_name, pages=None):
+    """Yield (page_num, tables, section_lines) from the template's regions and heading map"""
+    template = STATEMENT_TEMPLATES[template_name]
+    table_settings = template['table_settings']
+
+    doc = fitz.open(pdf_path)
+    pdf = pdfplumber.open(pdf_path) if table_settings is not None else None
+    try:
+        for page_num in range(len(doc)) if pages is None else pages:
+            tables = []
+            if pdf is not None:
+                plumber_page = pdf.pages[page_num]
+                for box in template['table_boxes']:
+                    tables.extend(plumber_page.crop(box).extract_tables(table_settings))
+                plumber_page.flush_cache()
+
+            yield page_num, tables, page_section_lines(doc.load_page(page_num), template)
+    finally:
+        doc.close()
+        if pdf is not None:
+            pdf.close()
@@ -0,0 +1,198 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+from json_files import write_json_atomic
+from text_normalization import normalize_input_text
+
+# Directory holding one JSON history file per account; set to "" to disable
+HISTORY_DIR = os.getenv("SUMMARY_HISTORY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "summary_history"))
+
+# Summaries remembered per section, so content that flips back can still be reused
+MAX_SUMMARIES_PER_SECTION = 12
+
+# Uploads for the same account can finish together; each save merges into the stored file under this lock
+SAVE_LOCK = threading.Lock()
+
+# Above this share of changed lines a delta prompt is no cheaper than a full one
+DELTA_MAX_CHANGE_RATIO = 0.5
+
+# Account numbers following an "Account" / "Account Number:" label
+ACCOUNT_NUMBER_RE = re.compile(r'Account(?:\s+(?:Number|No\.?|#))?[A-Za-z:#\s]{0,60}?(\d[\d-]{4,}\d)\b')
+
+DELTA_PROMPT_TEMPLATE = """{prompt}
+
+This section was summarized for the previous statement of the same account. Previous summary:
+{previous_summary}
+
+Lines added since the previous statement:
+{added}
+
+Lines removed since the previous statement:
+{removed}
+
+Update the previous summary so it describes the current statement. Keep facts that did not change, correct anything that did, and write in clear, complete sentences:"""
+
+
+def history_enabled():
+    return bool(HISTORY_DIR)
+
+
+def account_key(text):
+    """
+    Return a stable, anonymized key for the account(s) a statement covers,
+    or None when no account number can be found.
+    """
+    numbers = sorted(set(ACCOUNT_NUMBER_RE.findall(text or "")))
+    if not numbers:
+        return None
+    return hashlib.sha256('|'.join(numbers).encode("utf-8")).hexdigest()[:32]
+
+
+def section_lines(content):
+    """
+    Normalized lines of a section: one per text line or table row. Text lines
+    were normalized at extraction, so only table rows and plain-text content
+    (such as the overall summary's input) are normalized here.
+    """
+    if not isinstance(content, list):
+        normalized = (normalize_input_text(line) for line in str(content).split('\n'))
+        return [line for line in normalized if line]
+
+    lines = []
+    for item in content:
+        if isinstance(item, list):  # A table
+            for row in item:
+                line = normalize_input_text('\t'.join(str(cell) if cell else '' for cell in row))
+                if line:
+                    lines.append(line)
+        elif item:
+            lines.append(str(item))
+    return lines
+
+
+def summary_key(lines, model=None, route=None, prompt_version=None):
+    """
+    Key a summary is stored and reused under: the section's normalized lines
+    plus what produced the summary. A different model, route (generation
+    length) or prompt version summarizes the section again.
+    """
+    producer = f"{model or ''}|{route or ''}|{prompt_version or ''}"
+    return hashlib.sha256('\n'.join([producer] + lines).encode("utf-8")).hexdigest()
+
+
+def history_path(account):
+    return os.path.join(HISTORY_DIR, f"{account}.json")
+
+
+def load_history(account):
+    """Load the stored section summaries for an account"""
+    try:
+        with open(history_path(account), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'sections': {}}
+    except Exception as e:
+        print(f"Error loading summary history for {account}: {e}")
+        return {'sections': {}}
+
+
+def save_history(account, history):
+    """
+    Merge an account's history into the stored file and write it atomically.
+    Another upload of the same account may have saved since this one loaded
+    the history; its summaries are kept and the newer 'latest' wins.
+    """
+    try:
+        with SAVE_LOCK:
+            write_json_atomic(history_path(account), merge_history(load_history(account), history))
+    except Exception as e:
+        print(f"Error saving summary history for {account}: {e}")
+
+
+def merge_history(stored, history):
+    """Combine two versions of an account's history"""
+    merged = {'sections': dict(stored['sections'])}
+    for section_name, section in history['sections'].items():
+        current = merged['sections'].get(section_name)
+        if current is None:
+            merged['sections'][section_name] = section
+            continue
+
+        summaries = dict(current['summaries'])
+        for digest, summary in section['summaries'].items():
+            summaries.setdefault(digest, summary)
+        while len(summaries) > MAX_SUMMARIES_PER_SECTION:
+            summaries.pop(next(iter(summaries)))
+
+        latest = max([current['latest'], section['latest']], key=lambda entry: entry['updated'] if entry else '')
+        merged['sections'][section_name] = {'summaries': summaries, 'latest': latest}
+    return merged
+
+
+def find_summary(history, section_name, digest):
+    """Return the stored summary for identical section content, if any"""
+    section = history['sections'].get(section_name)
+    if not section:
+        return None
+    return section['summaries'].get(digest)
+
+
+def previous_section(history, section_name):
+    """Return {'summary', 'lines'} from the latest statement that had this section"""
+    section = history['sections'].get(section_name)
+    if not section:
+        return None
+    return section['latest']
+
+
+def record_summary(history, section_name, digest, lines, summary):
+    """Remember a fresh summary as the latest version of a section"""
+    section = history['sections'].setdefault(section_name, {'summaries': {}, 'latest': None})
+
+    summaries = section['summaries']
+    summaries.pop(digest, None)
+    summaries[digest] = summary
+    while len(summaries) > MAX_SUMMARIES_PER_SECTION:
+        summaries.pop(next(iter(summaries)))
+
+    section['latest'] = {
+        'summary': summary,
+        'lines': lines,
+        'updated': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def build_delta_prompt(prompt, previous, lines, max_chars=4000):
+    """
+    Build a prompt asking the model to update the previous summary with the
+    lines that changed, or return None when too much changed for that to help.
+    """
+    matcher = difflib.SequenceMatcher(None, previous['lines'], lines, autojunk=False)
+
+    added, removed = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('replace', 'delete'):
+            removed.extend(previous['lines'][i1:i2])
+        if tag in ('replace', 'insert'):
+            added.extend(lines[j1:j2])
+
+    changed = len(added) + len(removed)
+    if changed > DELTA_MAX_CHANGE_RATIO * max(len(lines) + len(previous['lines']), 1):
+        return None
+
+    added_text = '\n'.join(added) or "(none)"
+    removed_text = '\n'.join(removed) or "(none)"
+    if len(added_text) + len(removed_text) > max_chars:
+        return None
+
+    return DELTA_PROMPT_TEMPLATE.format(
+        prompt=prompt,
+        previous_summary=previous['summary'],
+        added=added_text,
+        removed=removed_text,
+    )
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from benchmark_engines import SAMPLE_PDFS, text_overlap
+from extraction_engines import iter_pages, iter_pages_pymupdf, ocr_available, ocr_scanned_pages, pymupdf_available
+from processor import extract_tables_and_sections
+from section_names import SECTION_NAMES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def extract(pdf_path, engine):
+    # Templates off: template statements are read the same way by both engines
+    sections = extract_tables_and_sections(os.path.join(ROOT, pdf_path), engine=engine, use_templates=False,
+                                           remove_boilerplate=False)
+    assert 'error' not in sections, sections.get('error')
+    return sections
+
+
+@pytest.mark.skipif(not pymupdf_available(), reason="PyMuPDF is not installed")
+@pytest.mark.parametrize("pdf_path", SAMPLE_PDFS)
+def test_pymupdf_matches_pdfplumber(pdf_path):
+    reference = extract(pdf_path, "pdfplumber")
+    fast = extract(pdf_path, "pymupdf")
+
+    assert text_overlap(reference['overall_text'], fast['overall_text']) >= 0.99
+    for section in SECTION_NAMES:
+        ref_tables = [item for item in reference[section] if isinstance(item, list)]
+        fast_tables = [item for item in fast[section] if isinstance(item, list)]
+        assert fast_tables == ref_tables, section
+
+
+def scanned_pdf(path, text):
+    """One-page PDF whose only content is a picture of text, like a scanned statement"""
+    import fitz
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("L", (1700, 400), 255)
+    ImageDraw.Draw(image).text((60, 140), text, fill=0, font=ImageFont.load_default(size=64))
+    image_path = str(path / "scan.png")
+    image.save(image_path)
+
+    pdf_path = str(path / "scanned.pdf")
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, filename=image_path)
+    page.insert_text((72, 72), "1")  # a stray page number is not a text layer
+    doc.save(pdf_path)
+    doc.close()
+    return pdf_path
+
+
+@pytest.mark.skipif(not pymupdf_available(), reason="PyMuPDF is not installed")
+def test_native_text_pages_skip_ocr():
+    pdf_path = os.path.join(ROOT, SAMPLE_PDFS[0])
+    pages = list(iter_pages_pymupdf(pdf_path))
+    assert list(ocr_scanned_pages(pdf_path, iter(pages))) == pages
+
+
+@pytest.mark.skipif(not ocr_available(), reason="OCR needs PyMuPDF, pytesseract and the tesseract binary")
+def test_hybrid_ocrs_scanned_pages(tmp_path):
+    pdf_path = scanned_pdf(tmp_path, "DIVIDEND RECEIVED 1,234.56")
+
+    assert not list(iter_pages(pdf_path, "pymupdf"))[0][2].strip("1 \n")
+    [(page_num, tables, text)] = iter_pages(pdf_path, "hybrid")
+    assert page_num == 0 and tables == []
+    assert "DIVIDEND" in text.upper() and "1,234.56" in text
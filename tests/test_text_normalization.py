@@ -0,0 +1,22 @@
+import json
+import os
+
+import pytest
+
+from text_normalization import normalize_input_text, normalize_llm_output
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "normalization_golden.json")
+
+with open(GOLDEN_PATH, encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize("case", GOLDEN["input"])
+def test_input_matches_golden(case):
+    assert normalize_input_text(case["text"]) == case["expected"]
+
+
+@pytest.mark.parametrize("case", GOLDEN["output"])
+def test_output_matches_golden(case):
+    # The golden outputs were produced by the section-aware original pipeline
+    assert normalize_llm_output(case["text"]) == case["expected"]